@@ -1,7 +1,7 @@
 import json
 import os
 import logging
-import boto3
+import sys
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv
 from datetime import datetime
@@ -13,8 +13,15 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Adiciona o caminho do diretório visao-computacional ao sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.credentials import get_client
+from services.idempotency import idempotent
+from services.warmup import is_warmup_event, warm_status, warm_up, warmup_response
+
 # Inicializa o cliente Rekognition
-rekognition = boto3.client("rekognition", region_name=os.getenv('AWS_REGION', 'us-east-1'))
+rekognition = get_client("rekognition", region_name=os.getenv('AWS_REGION', 'us-east-1'))
 
 # Obtém as variáveis de ambiente
 BUCKET_NAME = os.getenv("BUCKET_NAME")
@@ -79,9 +86,20 @@ def process_faces(face_details):
     return face_data
 
 def health(event, context):
-    """Rota GET / - Retorna uma mensagem simples de saúde."""
+    """
+    Rota GET / - Retorna uma mensagem simples de saúde.
+
+    Com `?warm=true`, informa também o estado de aquecimento do container.
+    """
+    params = event.get("queryStringParameters") or {}
+    if params.get("warm") == "true":
+        return {
+            "statusCode": 200,
+            "body": json.dumps({"message": "API está funcionando!", "warmup": warm_status()})
+        }
     return create_response(200, "API está funcionando!")
 
+@idempotent
 def vision(event, context):
     """Função que processa a solicitação para detectar emoções faciais."""
     try:
@@ -127,6 +145,9 @@ def vision(event, context):
 # Funções principais do Lambda
 def lambda_handler(event, context):
     """Função principal do Lambda que roteia a requisição para a função apropriada."""
+    if is_warmup_event(event):
+        return warmup_response(warm_up(("rekognition",), event=event))
+
     route = event.get('path', '')
 
     if route == '/':
@@ -2,7 +2,6 @@
 import json
 import logging
 import os
-import boto3
 import sys
 from botocore.exceptions import ClientError
 from dotenv import load_dotenv  # Importa a biblioteca dotenv
@@ -20,8 +19,14 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(parent_dir)
 
+from services.credentials import get_client
+from services.emotion_stats import get_emotion_stats
+from services.idempotency import idempotent
+from services.search_index import get_search_index
+from services.warmup import is_warmup_event, warm_up, warmup_response
+
 # Inicializa o cliente Rekognition
-rekognition = boto3.client("rekognition", region_name=os.getenv('AWS_REGION', 'us-east-1'))
+rekognition = get_client("rekognition", region_name=os.getenv('AWS_REGION', 'us-east-1'))
 
 # Obtém o nome da pasta da variável de ambiente
 FOLDER_NAME = os.getenv("FOLDER_NAME", "myphotos")  # Substitua "myphotos" pelo nome padrão desejado
@@ -34,11 +39,14 @@ def check_env_vars():
     if missing_vars:
         raise EnvironmentError(f"Faltando variáveis de ambiente: {', '.join(missing_vars)}")
 
-def create_response(status_code, message):
+def create_response(status_code, message, data=None):
     """Cria uma resposta padronizada."""
+    response_body = {"message": message}
+    if data is not None:
+        response_body["data"] = data
     return {
         "statusCode": status_code,
-        "body": json.dumps({"message": message})
+        "body": json.dumps(response_body)
     }
 
 def validate_input(body):
@@ -78,6 +86,24 @@ def process_faces(face_details):
     logger.info("Processamento concluído. Total de faces detectadas: %d", len(face_data["faces"]))
     return face_data
 
+def index_faces(image_path: str, face_data: dict):
+    """Registra as emoções classificadas no índice de busca, sem interromper a requisição em caso de falha."""
+    if "faces" not in face_data:
+        return
+    try:
+        get_search_index().index_emotions(
+            image_path, [(face["emotion"], face["confidence"]) for face in face_data["faces"]]
+        )
+    except Exception as e:
+        logger.warning("Falha ao indexar emoções de %s: %s", image_path, e)
+
+def record_emotion_stats(image_path: str, face_details: list):
+    """Atualiza as estatísticas da pasta com todas as emoções das faces, sem interromper a requisição em caso de falha."""
+    try:
+        get_emotion_stats().record_analysis(image_path, [face.get("Emotions", []) for face in face_details])
+    except Exception as e:
+        logger.warning("Falha ao atualizar estatísticas de %s: %s", image_path, e)
+
 def detect_face_emotions(bucket_name: str, image_path: str) -> dict:
     """Detecta emoções faciais em uma imagem armazenada no S3 usando o AWS Rekognition."""
     check_env_vars()  # Verifica variáveis de ambiente
@@ -96,12 +122,15 @@ def detect_face_emotions(bucket_name: str, image_path: str) -> dict:
         logger.error("Erro ao chamar a API Rekognition: %s", e)
         return create_response(500, "Erro ao chamar o serviço Rekognition")
 
+    record_emotion_stats(image_path, response.get("FaceDetails", []))
+
     if not response.get("FaceDetails"):
         logger.warning("Nenhuma face detectada na imagem.")
         return {"faces": []}  # Retorna uma lista vazia de faces
 
     return process_faces(response["FaceDetails"])
 
+@idempotent
 def v1_vision(event, context):
     """
     Função para detectar emoções faciais em uma imagem armazenada no S3.
@@ -138,6 +167,8 @@ def v1_vision(event, context):
         logger.error("Erro ao detectar emoções: %s", face_data["error"])
         return create_response(500, "Erro ao detectar emoções.")
 
+    index_faces(image_path, face_data)
+
     logger.info("Processamento concluído com sucesso.")
     return {
         "statusCode": 200,
@@ -147,6 +178,9 @@ def v1_vision(event, context):
 # Função principal do Lambda
 def lambda_handler(event, context):
     """Função principal do Lambda que roteia a requisição para a função apropriada."""
+    if is_warmup_event(event):
+        return warmup_response(warm_up(("rekognition", "search_index", "emotion_stats"), event=event))
+
     route = event.get('path', '')
 
     if route == '/v1/vision':
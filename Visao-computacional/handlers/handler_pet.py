@@ -1,10 +1,11 @@
 import json
 import logging
 import os
-import boto3
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 import sys
-from botocore.exceptions import ClientError
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 from dotenv import load_dotenv  # Importa a biblioteca dotenv
 
 # Carrega as variáveis do arquivo .env
@@ -14,22 +15,50 @@ load_dotenv()
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Importações de serviços
+from services.admission import ADMISSION_ENABLED, DECISION_DEGRADE, DECISION_REJECT, get_admission_controller, get_deadline_ms
 from services.bedrock_runtime import invoke_bedrock_model
-from services.get_image import get_image_details, detect_face_emotions  # Importa as funções corretas
+from services.breed_tips import tips_cache, get_fallback_tips
+from services.circuit_breaker import CircuitBreakerOpenError
+from services.credentials import get_client
+from services.frame_sampling import (
+    MAX_ANALYZED_FRAMES, MULTIFRAME_MAX_BYTES, UnsupportedMediaError, aggregate_emotions, aggregate_labels, analyze_frames, check_decoder,
+    decode_frames, is_multiframe, select_keyframes,
+)
+from services.get_image import ImageTooLargeError, get_image_details, get_image_bytes  # Importa as funções corretas
+from services.emotion_stats import get_emotion_stats
+from services.idempotency import idempotent
+from services.image_hash import compute_dhash, get_duplicate_index
+from services.region_pool import get_region_pool
+from services.search_index import get_search_index
+from services.warmup import WARMUP_BREEDS, is_warmup_event, warm_up, warmup_response
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Inicializa a sessão boto3 com credenciais do AWS CLI
-session = boto3.Session()
-
-rekognition = session.client("rekognition")
-bedrock = session.client("bedrock-runtime")  # Cliente para Bedrock
+# Cliente Rekognition com as credenciais compartilhadas (renovadas antes de expirar)
+rekognition = get_client("rekognition")
 
 # Obtém o nome da pasta do ambiente
 FOLDER_NAME = os.getenv("FOLDER_NAME", "myphotos")  # Nome da pasta padrão
 
+# Limite do Rekognition para imagens enviadas por Bytes
+REKOGNITION_MAX_BYTES = 5 * 1024 * 1024
+
+# Segundos de espera máxima por região antes do failover (ou o prazo restante da requisição, se menor)
+REKOGNITION_TIMEOUT = float(os.getenv("REKOGNITION_TIMEOUT", "5"))
+
+# Clientes do Rekognition nas regiões permitidas, para as imagens enviadas por Bytes
+rekognition_pool = get_region_pool(
+    "rekognition", config=Config(connect_timeout=2, read_timeout=REKOGNITION_TIMEOUT),
+)
+
+# Reaproveitamento de análises de imagens quase idênticas (hash perceptual)
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "false").lower() == "true"
+
+# Controle de admissão dos estágios caros (Rekognition e Bedrock)
+admission = get_admission_controller()
+
 def check_env_vars():
     """Verifica se todas as variáveis de ambiente obrigatórias estão definidas."""
     required_vars = ['AWS_REGION', 'BUCKET_NAME', 'FOLDER_NAME']
@@ -38,15 +67,18 @@ def check_env_vars():
     if missing_vars:
         raise EnvironmentError(f"Faltando variáveis de ambiente: {', '.join(missing_vars)}")
 
-def create_response(status_code, message, data=None):
+def create_response(status_code, message, data=None, headers=None):
     """Cria uma resposta padronizada."""
     response_body = {"message": message}
     if data is not None:
         response_body["data"] = data
-    return {
+    response = {
         "statusCode": status_code,
         "body": json.dumps(response_body, ensure_ascii=True)
     }
+    if headers:
+        response["headers"] = headers
+    return response
 
 def validate_input(body: dict) -> tuple:
     """Valida os campos obrigatórios no corpo da requisição."""    
@@ -59,12 +91,43 @@ def validate_input(body: dict) -> tuple:
 
     return body["bucket"], body["imageName"]
 
-def detect_labels(bucket: str, image_name: str) -> dict:
+def call_rekognition(operation: str, bucket: str, image_path: str, image_bytes: bytes = None, deadline: float = None,
+                     **kwargs) -> dict:
+    """
+    Chama uma operação do Rekognition sobre a imagem.
+
+    Se a imagem já foi baixada, envia os Bytes pela região mais saudável (com failover), sem
+    passar de `deadline` (`time.monotonic()`); senão usa S3Object no cliente da região do bucket.
+    """
+    with admission.stage("rekognition"):
+        if image_bytes is not None and len(image_bytes) <= REKOGNITION_MAX_BYTES:
+            return rekognition_pool.call(operation, deadline=deadline, Image={"Bytes": image_bytes}, **kwargs)
+        return getattr(rekognition, operation)(Image={"S3Object": {"Bucket": bucket, "Name": image_path}}, **kwargs)
+
+def fetch_image_bytes(bucket: str, image_name: str) -> bytes:
+    """
+    Baixa a imagem para enviá-la ao Rekognition por Bytes, com failover entre regiões.
+
+    Retorna None (a análise segue por S3Object na região do bucket) se houver uma só região
+    no pool, se a imagem passar do limite do Rekognition ou se não puder ser baixada.
+    """
+    if len(rekognition_pool.regions) == 1:
+        return None
+    image_path = f"{FOLDER_NAME}/{image_name}"
+    try:
+        return get_image_bytes(bucket, image_path, max_bytes=REKOGNITION_MAX_BYTES)
+    except ImageTooLargeError:
+        logger.info("%s excede o limite de Bytes do Rekognition; usando S3Object.", image_path)
+    except (BotoCoreError, ClientError) as e:
+        logger.warning("Não foi possível baixar %s; usando S3Object: %s", image_path, e)
+    return None
+
+def detect_labels(bucket: str, image_name: str, image_bytes: bytes = None, deadline: float = None) -> dict:
     """Detecta rótulos em uma imagem armazenada no S3 usando Rekognition."""
     image_path = f"{FOLDER_NAME}/{image_name}"
     try:
-        response = rekognition.detect_labels(
-            Image={"S3Object": {"Bucket": bucket, "Name": image_path}},
+        response = call_rekognition(
+            "detect_labels", bucket, image_path, image_bytes, deadline,
             MaxLabels=10,
             MinConfidence=75,
         )
@@ -73,8 +136,12 @@ def detect_labels(bucket: str, image_name: str) -> dict:
         logger.error(f"Erro ao detectar rótulos: {str(e)}")
         return {"error": str(e)}
 
-def generate_pastor_tips(labels: list) -> dict:
-    """Gera dicas sobre cães pastores baseadas em rótulos detectados."""
+def generate_pastor_tips(labels: list, deadline: float = None) -> dict:
+    """
+    Gera dicas sobre cães pastores baseadas em rótulos detectados.
+
+    A chamada ao Bedrock não passa de `deadline` (`time.monotonic()`); sem tempo, usa as dicas de contingência.
+    """
     exclude_keywords = {"Animal", "Canine", "Mammal", "Pet", "Dog"}
     pastor_labels = [
         label for label in labels if label.get("Name") not in exclude_keywords and 
@@ -96,36 +163,26 @@ def generate_pastor_tips(labels: list) -> dict:
             "Problemas de Saúde Comuns:\n"
         )
 
-        native_request = {
-            "inputText": prompt,
-            "textGenerationConfig": {
-                "maxTokenCount": 500,
-                "temperature": 0.7,
-                "topP": 0.9,
-            },
-        }
-
         logger.info(f"Enviando prompt ao Bedrock: {prompt}")
 
         try:
-            response = bedrock.invoke_model(
-                modelId="amazon.titan-text-express-v1",
-                body=json.dumps(native_request),
-            )
-
-            model_response = json.loads(response["body"].read())
-            bedrock_response = model_response["results"][0]["outputText"]
-
+            with admission.stage("bedrock"):
+                bedrock_response = invoke_bedrock_model(prompt, deadline=deadline)
             logger.info(f"Resposta do Bedrock: {bedrock_response}")
+            tips_cache.put(raca_nome, bedrock_response)
 
             return {
                 "labels": pastor_labels,
                 "Dicas": bedrock_response,
+                "origem_dicas": "bedrock",
             }
 
+        except CircuitBreakerOpenError:
+            logger.warning("Bedrock indisponível (circuito aberto); usando dicas de contingência.")
+            return {"labels": pastor_labels, **get_fallback_tips(raca_nome)}
         except Exception as e:
             logger.error(f"Erro ao invocar o modelo: {e}")
-            return {"error": str(e)}
+            return {"labels": pastor_labels, **get_fallback_tips(raca_nome)}
 
     logger.warning("Nenhuma raça identificada.")
     return {"labels": [], "Dicas": "Nenhuma dica disponível."}
@@ -141,28 +198,192 @@ def extract_faces(response: dict) -> list:
         for face in response.get("FaceDetails", [])
     ]
 
-def detect_face_emotions(bucket_name: str, image_path: str) -> dict:
+def detect_face_emotions(bucket_name: str, image_path: str, image_bytes: bytes = None, deadline: float = None) -> dict:
     """Detecta emoções faciais em uma imagem armazenada no S3 usando o AWS Rekognition."""
     if not bucket_name or not image_path:
         logger.error("Nome do bucket ou da imagem não pode ser vazio.")
         return create_response(400, "Nome do bucket ou da imagem não pode ser vazio.")
 
     try:
-        response = rekognition.detect_faces(
-            Image={"S3Object": {"Bucket": bucket_name, "Name": image_path}},
+        response = call_rekognition(
+            "detect_faces", bucket_name, image_path, image_bytes, deadline,
             Attributes=["ALL"]
         )
         logger.info("Resposta do Rekognition recebida com sucesso.")
-    except ClientError as e:
+    except (BotoCoreError, ClientError, TimeoutError) as e:
         logger.error("Erro ao chamar a API Rekognition: %s", e)
         return create_response(500, "Erro ao chamar o serviço Rekognition")
 
     if not response.get("FaceDetails"):
         logger.warning("Nenhuma face detectada na imagem.")
-        return {"faces": []}  # Retorna uma lista vazia de faces
+        return {"FaceDetails": []}  # Nenhuma face detectada
+
+    return response
+
+def analyze_image(bucket: str, image_name: str, image_bytes: bytes = None, degraded: bool = False,
+                  deadline: float = None) -> dict:
+    """
+    Detecta faces e rótulos da imagem e gera as dicas sobre cães pastores.
+
+    No modo degradado (sobrecarga), só as faces são analisadas: sem rótulos nem dicas.
+    """
+    # Detecta emoções na imagem
+    face_response = detect_face_emotions(bucket, f"{FOLDER_NAME}/{image_name}", image_bytes, deadline)
+    logger.info("Rekognition face response: %s", json.dumps(face_response))
+
+    faces = extract_faces(face_response)
+
+    # Todas as emoções de cada face, para as estatísticas (None se o Rekognition falhou)
+    face_emotions = None
+    if "FaceDetails" in face_response:
+        face_emotions = [face.get("Emotions", []) for face in face_response["FaceDetails"]]
+
+    if degraded:
+        return {"faces": faces, "face_emotions": face_emotions, "labels": [], "pets": None, "complete": False}
+
+    # Detectando pets usando Rekognition (labels)
+    rekognition_label_response = detect_labels(bucket, image_name, image_bytes, deadline)
+    labels = rekognition_label_response.get("Labels", [])
+
+    # Verifica se há cães pastores e gera dicas
+    return {
+        "faces": faces,
+        "face_emotions": face_emotions,
+        "labels": labels,
+        "pets": generate_pastor_tips(labels, deadline),
+        # As duas chamadas ao Rekognition responderam (uma falha vira lista vazia de faces ou rótulos)
+        "complete": face_emotions is not None and "error" not in rekognition_label_response,
+    }
+
+def is_reusable_analysis(analysis: dict) -> bool:
+    """
+    Indica se a análise pode ser reaproveitada para imagens quase idênticas.
+
+    Exige as duas chamadas ao Rekognition bem-sucedidas e dicas geradas pelo Bedrock (ou
+    nenhuma raça a consultar); análises degradadas ou com dicas de contingência não servem.
+    """
+    if not analysis.get("complete"):
+        return False
+    pets = analysis["pets"]
+    return pets.get("origem_dicas") == "bedrock" or not pets.get("labels")
+
+def load_keyframes(bucket: str, image_name: str) -> tuple:
+    """
+    Decodifica o GIF ou vídeo e escolhe os quadros representativos (mudança de cena).
+
+    Returns:
+        tuple: (número de quadros decodificados, quadros escolhidos).
+
+    Raises:
+        UnsupportedMediaError: Vídeo sem decodificador disponível (verificado antes do download).
+        ImageTooLargeError: Arquivo acima de MULTIFRAME_MAX_BYTES (verificado pelo ContentLength).
+    """
+    image_path = f"{FOLDER_NAME}/{image_name}"
+    check_decoder(image_name)
+    data = get_image_bytes(bucket, image_path, max_bytes=MULTIFRAME_MAX_BYTES)
+    decoded, keyframes = select_keyframes(decode_frames(data, image_name))
+    logger.info("%s: %d quadros decodificados, %d escolhidos para análise.", image_path, decoded, len(keyframes))
+    return decoded, keyframes
+
+def analyze_multiframe(bucket: str, image_name: str, keyframes: tuple, degraded: bool = False,
+                       deadline: float = None) -> dict:
+    """
+    Analisa GIFs e vídeos curtos pelos quadros escolhidos em `load_keyframes`.
+
+    Os quadros escolhidos vão ao Rekognition por Bytes, em paralelo; emoções e rótulos são
+    agregados ao longo do tempo e as dicas são geradas uma vez, a partir dos rótulos agregados.
+    """
+    image_path = f"{FOLDER_NAME}/{image_name}"
+    decoded, selected = keyframes
 
-    return extract_faces(response)
+    def analyze_frame(frame_bytes: bytes) -> dict:
+        face_response = detect_face_emotions(bucket, image_path, frame_bytes, deadline)
+        labels = [] if degraded else detect_labels(bucket, image_name, frame_bytes, deadline).get("Labels", [])
+        face_emotions = None
+        if "FaceDetails" in face_response:
+            face_emotions = [face.get("Emotions", []) for face in face_response["FaceDetails"]]
+        return {"faces": extract_faces(face_response), "face_emotions": face_emotions, "labels": labels}
 
+    frame_results = analyze_frames(selected, analyze_frame)
+
+    # As mesmas faces aparecem em vários quadros: as estatísticas usam só o quadro com mais faces
+    # (o primeiro, em caso de empate; None se o Rekognition falhou em todos)
+    analyzed_emotions = [result["face_emotions"] for result in frame_results if result["face_emotions"] is not None]
+    labels = aggregate_labels(frame_results)
+
+    return {
+        "faces": [{**face, "timestamp": result["timestamp"]} for result in frame_results for face in result["faces"]],
+        "face_emotions": max(analyzed_emotions, key=len) if analyzed_emotions else None,
+        "labels": labels,
+        "pets": None if degraded else generate_pastor_tips(labels, deadline),
+        "frames": {
+            "decoded": decoded,
+            "analyzed": len(selected),
+            **aggregate_emotions(frame_results),
+            "timeline": [
+                {
+                    "timestamp": result["timestamp"],
+                    "emotions": [face["classified_emotion"] for face in result["faces"]],
+                    "labels": [label["Name"] for label in result["labels"]],
+                }
+                for result in frame_results
+            ],
+        },
+    }
+
+def index_analysis(image_key: str, analysis: dict, degraded: bool = False):
+    """
+    Registra a análise no índice de busca e nas estatísticas da pasta, sem interromper a requisição em caso de falha.
+
+    No modo degradado os rótulos não foram detectados: os já indexados para a imagem são mantidos.
+    """
+    try:
+        search_index = get_search_index()
+        search_index.index_emotions(
+            image_key, [(face["classified_emotion"], face["classified_emotion_confidence"]) for face in analysis["faces"]]
+        )
+        if not degraded:
+            search_index.index_labels(image_key, analysis.get("labels", []))
+    except Exception as e:
+        logger.warning("Falha ao indexar a análise de %s: %s", image_key, e)
+
+    if analysis.get("face_emotions") is None:
+        return
+    try:
+        get_emotion_stats().record_analysis(image_key, analysis["face_emotions"])
+    except Exception as e:
+        logger.warning("Falha ao atualizar estatísticas de %s: %s", image_key, e)
+
+def analyze_image_deduplicated(bucket: str, image_name: str, degraded: bool = False, deadline: float = None) -> dict:
+    """Reaproveita a análise de uma imagem quase idêntica já processada ou analisa e indexa a nova."""
+    image_key = f"{FOLDER_NAME}/{image_name}"
+    try:
+        image_bytes = get_image_bytes(bucket, image_key, max_bytes=REKOGNITION_MAX_BYTES)
+        image_hash = compute_dhash(image_bytes)
+    except Exception as e:
+        logger.warning("Não foi possível calcular o hash perceptual de %s: %s", image_key, e)
+        return analyze_image(bucket, image_name, degraded=degraded, deadline=deadline)
+
+    duplicate_index = get_duplicate_index()
+    try:
+        duplicate = duplicate_index.find(image_hash)
+    except Exception as e:
+        logger.warning("Índice de duplicatas indisponível para %s: %s", image_key, e)
+        duplicate = None
+    if duplicate:
+        logger.info("Imagem %s quase idêntica a %s (distância %d); reaproveitando análise.",
+                    image_key, duplicate["image_key"], duplicate["distance"])
+        return {**duplicate["analysis"], "duplicate_of": duplicate["image_key"]}
+
+    analysis = analyze_image(bucket, image_name, image_bytes, degraded=degraded, deadline=deadline)
+    if not degraded and is_reusable_analysis(analysis):
+        try:
+            duplicate_index.add(image_hash, image_key, analysis)
+        except Exception as e:
+            logger.warning("Falha ao registrar %s no índice de duplicatas: %s", image_key, e)
+    return analysis
+
+@idempotent
 def handler_pastor(event: dict, context) -> dict:
     """Processa a imagem e gera dicas sobre cães pastores."""
     try:
@@ -172,23 +393,51 @@ def handler_pastor(event: dict, context) -> dict:
         # Valida e obtém bucket, nome da imagem e nome da pasta
         bucket, image_name = validate_input(body)
 
-        # Detecta emoções na imagem
-        face_response = detect_face_emotions(bucket, f"{FOLDER_NAME}/{image_name}")
-        logger.info("Rekognition face response: %s", json.dumps(face_response))
-
-        faces = extract_faces(face_response)
-
-        # Detectando pets usando Rekognition (labels)
-        rekognition_label_response = detect_labels(bucket, image_name)
-        labels = rekognition_label_response.get("Labels", [])
-
-        # Verifica se há cães pastores e gera dicas
-        pastor_analysis = generate_pastor_tips(labels)
-        result = create_result(bucket, image_name, faces, pastor_analysis)
+        # Prazo da requisição: limita a espera pelo Bedrock e orienta a admissão
+        deadline_ms = get_deadline_ms(event, context)
+        deadline = time.monotonic() + deadline_ms / 1000
+
+        multiframe = is_multiframe(image_name)
+
+        # Rejeita de imediato, ou degrada, se o tempo previsto não couber no prazo da requisição.
+        # GIFs e vídeos são admitidos pelo limite de quadros analisados, antes do download e da decodificação.
+        degraded = False
+        if ADMISSION_ENABLED:
+            decision, retry_after = admission.decide((deadline - time.monotonic()) * 1000,
+                                                     frames=MAX_ANALYZED_FRAMES if multiframe else 1)
+            if decision == DECISION_REJECT:
+                return create_response(429, "Serviço sobrecarregado. Tente novamente mais tarde.",
+                                       headers={"Retry-After": str(retry_after)})
+            degraded = decision == DECISION_DEGRADE
+
+        if multiframe:
+            keyframes = load_keyframes(bucket, image_name)
+            analysis = analyze_multiframe(bucket, image_name, keyframes, degraded=degraded, deadline=deadline)
+        elif DEDUP_ENABLED:
+            analysis = analyze_image_deduplicated(bucket, image_name, degraded=degraded, deadline=deadline)
+        else:
+            analysis = analyze_image(bucket, image_name, fetch_image_bytes(bucket, image_name),
+                                     degraded=degraded, deadline=deadline)
+
+        index_analysis(f"{FOLDER_NAME}/{image_name}", analysis, degraded=degraded)
+
+        result = create_result(bucket, image_name, analysis["faces"], analysis["pets"])
+        if "duplicate_of" in analysis:
+            result["duplicate_of"] = analysis["duplicate_of"]
+        if "frames" in analysis:
+            result["frames"] = analysis["frames"]
+        if degraded:
+            result["degraded"] = True  # Só faces: sem rótulos nem dicas
 
         logger.info("Response: %s", json.dumps(result))
         return create_response(200, "Processamento bem-sucedido", result)
 
+    except ImageTooLargeError as e:
+        logger.error(f"Arquivo grande demais: {str(e)}")
+        return create_response(413, str(e))
+    except UnsupportedMediaError as e:
+        logger.error(f"Formato não suportado: {str(e)}")
+        return create_response(415, str(e))
     except ValueError as ve:
         logger.error(f"Valor inválido: {str(ve)}")
         return create_response(400, str(ve))
@@ -200,18 +449,28 @@ def create_result(bucket: str, image_name: str, faces: list, pastor_analysis: di
     """Cria o resultado final a ser retornado na resposta da API."""
     return {
         "url_to_image": f"https://{bucket}.s3.amazonaws.com/{FOLDER_NAME}/{image_name}",
-        "created_image": datetime.now(datetime.timezone.utc).strftime("%d-%m-%Y %H:%M:%S"),
+        "created_image": datetime.now(timezone.utc).strftime("%d-%m-%Y %H:%M:%S"),
         "faces": faces or None,
         "pets": pastor_analysis,
     }
 
+def warm_breed_tips():
+    """Pré-carrega no cache as dicas das raças mais consultadas que ainda não estão no container."""
+    for breed in WARMUP_BREEDS:
+        if tips_cache.get(breed) is None:
+            generate_pastor_tips([{"Name": breed, "Categories": [{"Name": "Animals and Pets"}]}])
+
 def lambda_handler(event, context):
     """Função principal do Lambda que roteia a requisição para a função apropriada."""
+    if is_warmup_event(event):
+        return warmup_response(warm_up(("s3", "rekognition", "rekognition_regions", "bedrock", "search_index", "emotion_stats"),
+                                         extra_steps={"breed_tips": warm_breed_tips}, event=event))
+
     route = event.get('path', '')
 
     if route == '/v1/vision':
         return v1_vision(event, context)  # Presumindo que v1_vision já está implementada
-    elif route == '/v1/pastor':
+    elif route in ('/v1/pastor', '/v2/vision'):
         return handler_pastor(event, context)
     else:
         return create_response(404, "Rota não encontrada.")
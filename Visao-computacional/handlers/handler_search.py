@@ -0,0 +1,103 @@
+# handlers/handler_search.py
+import json
+import logging
+import os
+import sys
+import time
+
+# Inicializa o logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Adiciona o caminho do diretório visao-computacional ao sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from services.search_index import KIND_EMOTION, KIND_LABEL, get_search_index
+from services.warmup import is_warmup_event, warm_up, warmup_response
+
+MAX_RESULTS = 1000
+
+def create_response(status_code, message, data=None):
+    """Cria uma resposta padronizada."""
+    response_body = {"message": message}
+    if data is not None:
+        response_body["data"] = data
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(response_body, ensure_ascii=True)
+    }
+
+def parse_search_params(params: dict) -> dict:
+    """
+    Valida os parâmetros de busca da query string.
+
+    Args:
+        params (dict): queryStringParameters do evento.
+
+    Returns:
+        dict: kind, term, folder, min_confidence e limit.
+
+    Raises:
+        ValueError: Se os parâmetros forem inválidos.
+    """
+    emotion = params.get("emotion")
+    label = params.get("label")
+    if bool(emotion) == bool(label):
+        raise ValueError("Informe exatamente um dos parâmetros 'emotion' ou 'label'.")
+
+    try:
+        min_confidence = float(params.get("minConfidence", 0))
+        limit = int(params.get("limit", 100))
+    except ValueError:
+        raise ValueError("Os parâmetros 'minConfidence' e 'limit' devem ser numéricos.")
+
+    if not 1 <= limit <= MAX_RESULTS:
+        raise ValueError(f"O parâmetro 'limit' deve estar entre 1 e {MAX_RESULTS}.")
+
+    return {
+        "kind": KIND_EMOTION if emotion else KIND_LABEL,
+        "term": emotion or label,
+        "folder": params.get("folder"),
+        "min_confidence": min_confidence,
+        "limit": limit,
+    }
+
+def v1_search(event, context):
+    """
+    Rota GET /v1/search - Busca imagens já analisadas por emoção ou rótulo.
+
+    Exemplos:
+        /v1/search?emotion=HAPPY&folder=myphotos
+        /v1/search?label=Border%20Collie&minConfidence=90
+    """
+    try:
+        search_params = parse_search_params(event.get("queryStringParameters") or {})
+    except ValueError as ve:
+        logger.error(f"Parâmetros inválidos: {str(ve)}")
+        return create_response(400, str(ve))
+
+    start = time.perf_counter()
+    try:
+        results = get_search_index().search(**search_params)
+    except Exception as e:
+        logger.error(f"Erro ao consultar o índice: {str(e)}")
+        return create_response(500, "Erro ao consultar o índice de busca.")
+
+    took_ms = round((time.perf_counter() - start) * 1000, 3)
+    logger.info("Busca %s=%s: %d resultados em %sms.", search_params["kind"], search_params["term"], len(results), took_ms)
+    return create_response(200, "Busca concluída", {"results": results, "count": len(results), "took_ms": took_ms})
+
+# Função principal do Lambda
+def lambda_handler(event, context):
+    """Função principal do Lambda que roteia a requisição para a função apropriada."""
+    if is_warmup_event(event):
+        return warmup_response(warm_up(("search_index",), event=event))
+
+    route = event.get('path', '')
+
+    if route == '/v1/search':
+        return v1_search(event, context)
+    else:
+        return create_response(404, "Rota não encontrada.")
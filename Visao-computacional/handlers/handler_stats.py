@@ -0,0 +1,91 @@
+# handlers/handler_stats.py
+import json
+import logging
+import os
+import sys
+from datetime import date
+
+# Inicializa o logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Adiciona o caminho do diretório visao-computacional ao sys.path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(parent_dir)
+
+from services.emotion_stats import get_emotion_stats
+from services.warmup import is_warmup_event, warm_up, warmup_response
+
+def create_response(status_code, message, data=None):
+    """Cria uma resposta padronizada."""
+    response_body = {"message": message}
+    if data is not None:
+        response_body["data"] = data
+    return {
+        "statusCode": status_code,
+        "body": json.dumps(response_body, ensure_ascii=True)
+    }
+
+def parse_stats_params(params: dict) -> dict:
+    """
+    Valida os parâmetros da query string.
+
+    Args:
+        params (dict): queryStringParameters do evento.
+
+    Returns:
+        dict: folder, start, end e granularity.
+
+    Raises:
+        ValueError: Se os parâmetros forem inválidos.
+    """
+    folder = params.get("folder")
+    if not folder:
+        raise ValueError("O parâmetro 'folder' é obrigatório.")
+
+    granularity = params.get("granularity", "day")
+    if granularity not in ("day", "total"):
+        raise ValueError("O parâmetro 'granularity' deve ser 'day' ou 'total'.")
+
+    try:
+        start = date.fromisoformat(params["from"]) if params.get("from") else None
+        end = date.fromisoformat(params["to"]) if params.get("to") else None
+    except ValueError:
+        raise ValueError("Os parâmetros 'from' e 'to' devem estar no formato AAAA-MM-DD.")
+
+    return {"folder": folder, "start": start, "end": end, "granularity": granularity}
+
+def v1_stats(event, context):
+    """
+    Rota GET /v1/stats - Distribuição de emoções por pasta e por dia.
+
+    Exemplo:
+        /v1/stats?folder=myphotos&from=2024-10-01&to=2024-10-31&granularity=day
+    """
+    try:
+        stats_params = parse_stats_params(event.get("queryStringParameters") or {})
+    except ValueError as ve:
+        logger.error(f"Parâmetros inválidos: {str(ve)}")
+        return create_response(400, str(ve))
+
+    try:
+        summary = get_emotion_stats().summary(**stats_params)
+    except Exception as e:
+        logger.error(f"Erro ao consultar as estatísticas: {str(e)}")
+        return create_response(500, "Erro ao consultar as estatísticas.")
+
+    return create_response(200, "Estatísticas obtidas com sucesso", summary)
+
+# Função principal do Lambda
+def lambda_handler(event, context):
+    """Função principal do Lambda que roteia a requisição para a função apropriada."""
+    if is_warmup_event(event):
+        return warmup_response(warm_up(("emotion_stats",), event=event))
+
+    route = event.get('path', '')
+
+    if route == '/v1/stats':
+        return v1_stats(event, context)
+    else:
+        return create_response(404, "Rota não encontrada.")
@@ -0,0 +1,218 @@
+"""
+Controle de admissão: prevê o tempo da requisição e rejeita (429) ou degrada as que não cabem no prazo.
+
+O que o controle enxerga é o estado do processo. No Lambda, cada container atende uma
+requisição por vez, então:
+
+    - `in_flight` e `queued` só contam as chamadas da própria requisição. Em uma imagem
+      isolada, a fila à frente é sempre vazia; ela só pesa quando a requisição dispara mais
+      chamadas simultâneas que a concorrência do estágio (GIFs e vídeos: até
+      2 x MAX_ANALYZED_FRAMES chamadas ao Rekognition, ver `decide(..., frames=)`).
+    - O sinal que reflete a carga de fora do container é o tempo de serviço EWMA: throttling,
+      filas e lentidão do Rekognition ou do Bedrock aumentam a latência observada pelo
+      container e, com ela, o tempo previsto.
+    - Não são vistos: quantas requisições os outros containers têm em andamento nem quanto
+      das cotas da conta (TPS do Rekognition, tokens do Bedrock) já foi consumido. Um container
+      novo começa com os tempos `prior` e só aprende a latência real nas primeiras chamadas.
+      Para limitar a carga total, use a concorrência reservada da função; o servidor local
+      (vários threads no mesmo processo) é o único cenário em que a fila é compartilhada.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Tuple
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+# Em vez de rejeitar, atende só as faces (sem rótulos nem dicas) quando isso cabe no prazo
+ADMISSION_DEGRADE = os.getenv("ADMISSION_DEGRADE", "true").lower() == "true"
+# Prazo quando a requisição não informa um (limite de integração do API Gateway)
+ADMISSION_DEFAULT_DEADLINE_MS = float(os.getenv("ADMISSION_DEFAULT_DEADLINE_MS", "29000"))
+# Folga reservada para S3, índices e serialização da resposta
+ADMISSION_MARGIN_MS = float(os.getenv("ADMISSION_MARGIN_MS", "500"))
+# Cabeçalho opcional com o orçamento de tempo do cliente, em milissegundos
+DEADLINE_HEADER = "x-request-timeout-ms"
+
+DECISION_ADMIT = "admit"
+DECISION_DEGRADE = "degrade"
+DECISION_REJECT = "reject"
+
+
+class StageTracker:
+    """
+    Trabalho em voo e na fila de um estágio (ex.: Rekognition, Bedrock) e seu tempo de serviço EWMA.
+
+    O número de chamadas simultâneas ao estágio é limitado por `concurrency`; as excedentes
+    esperam na fila. A espera prevista para uma nova chamada é o trabalho à frente dela
+    dividido pela concorrência, vezes o tempo de serviço médio.
+    """
+
+    def __init__(self, name: str, concurrency: int, prior_service_ms: float, alpha: float = 0.2):
+        self.name = name
+        self.concurrency = concurrency
+        self.service_ms = prior_service_ms
+        self.alpha = alpha
+        self.in_flight = 0
+        self.queued = 0
+
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._lock = threading.Lock()
+
+    def predicted_ms(self, calls: int = 1, parallel: int = 1) -> float:
+        """
+        Tempo previsto para uma nova requisição fazer `calls` chamadas sequenciais ao estágio
+        em cada uma de `parallel` linhas simultâneas (ex.: uma por quadro de um GIF).
+
+        As linhas que excedem as vagas livres esperam na fila; as que não cabem juntas na
+        concorrência do estágio são executadas em rodadas.
+        """
+        with self._lock:
+            ahead = self.in_flight + self.queued - self.concurrency + parallel
+            wait_ms = max(ahead, 0) / self.concurrency * self.service_ms
+            rounds = math.ceil(parallel / self.concurrency)
+            return wait_ms + calls * rounds * self.service_ms
+
+    @contextmanager
+    def slot(self):
+        """Ocupa uma vaga do estágio durante a chamada e atualiza o tempo de serviço."""
+        with self._lock:
+            self.queued += 1
+        self._slots.acquire()
+        with self._lock:
+            self.queued -= 1
+            self.in_flight += 1
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.monotonic() - start) * 1000
+            with self._lock:
+                self.in_flight -= 1
+                self.service_ms = self.service_ms * (1 - self.alpha) + elapsed_ms * self.alpha
+            self._slots.release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "concurrency": self.concurrency,
+                "service_ms": round(self.service_ms, 2),
+            }
+
+
+class AdmissionController:
+    """
+    Controle de admissão antes do pipeline de análise.
+
+    Cada modo do pipeline associa estágios ao número de chamadas sequenciais; nos estágios de
+    `per_frame_stages`, essas chamadas se repetem em paralelo para cada quadro analisado
+    (GIFs e vídeos). Uma requisição só é admitida
+    se o tempo previsto do modo completo couber no seu prazo; senão, se permitido, é atendida
+    no modo degradado, e se nem ele couber é rejeitada de imediato com o tempo sugerido
+    para tentar de novo, em vez de esperar na fila e falhar por timeout.
+    """
+
+    def __init__(self, stages: Iterable[StageTracker], full_plan: Dict[str, int], degraded_plan: Dict[str, int],
+                 per_frame_stages: Iterable[str] = (), degrade: bool = ADMISSION_DEGRADE,
+                 margin_ms: float = ADMISSION_MARGIN_MS):
+        self.stages = {stage.name: stage for stage in stages}
+        self.full_plan = full_plan
+        self.degraded_plan = degraded_plan
+        self.per_frame_stages = set(per_frame_stages)
+        self.degrade = degrade
+        self.margin_ms = margin_ms
+        self.counters = {DECISION_ADMIT: 0, DECISION_DEGRADE: 0, DECISION_REJECT: 0}
+        self._lock = threading.Lock()
+
+    def predict_ms(self, plan: Dict[str, int], frames: int = 1) -> float:
+        """Tempo previsto de um modo do pipeline (estágios executados em sequência) para `frames` quadros."""
+        return sum(
+            self.stages[name].predicted_ms(calls, frames if name in self.per_frame_stages else 1)
+            for name, calls in plan.items()
+        )
+
+    def decide(self, deadline_ms: float, frames: int = 1) -> Tuple[str, int]:
+        """
+        Decide se a requisição é admitida, degradada ou rejeitada.
+
+        Args:
+            deadline_ms (float): Prazo restante da requisição.
+            frames (int): Quadros a analisar (1 para imagens; MAX_ANALYZED_FRAMES em GIFs e vídeos,
+                admitidos antes da decodificação).
+
+        Returns:
+            tuple: (decisão, segundos sugeridos para o Retry-After; 0 se não rejeitada).
+        """
+        budget_ms = deadline_ms - self.margin_ms
+        full_ms = self.predict_ms(self.full_plan, frames)
+
+        if full_ms <= budget_ms:
+            decision, retry_after = DECISION_ADMIT, 0
+        elif self.degrade and self.predict_ms(self.degraded_plan, frames) <= budget_ms:
+            decision, retry_after = DECISION_DEGRADE, 0
+        else:
+            decision, retry_after = DECISION_REJECT, max(1, math.ceil((full_ms - budget_ms) / 1000))
+
+        with self._lock:
+            self.counters[decision] += 1
+        if decision != DECISION_ADMIT:
+            logger.warning("Admissão: %s (previsto %.0fms para %d quadro(s), prazo %.0fms).",
+                           decision, full_ms, frames, budget_ms)
+        return decision, retry_after
+
+    def stage(self, name: str):
+        """Context manager que ocupa uma vaga do estágio durante a chamada."""
+        return self.stages[name].slot()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {"decisions": counters, "stages": {name: stage.snapshot() for name, stage in self.stages.items()}}
+
+
+def get_deadline_ms(event: dict, context) -> float:
+    """
+    Prazo da requisição: o menor entre o cabeçalho `X-Request-Timeout-Ms`, o tempo restante
+    da invocação Lambda e o padrão `ADMISSION_DEFAULT_DEADLINE_MS`.
+    """
+    deadline_ms = ADMISSION_DEFAULT_DEADLINE_MS
+    for name, value in (event.get("headers") or {}).items():
+        if name.lower() == DEADLINE_HEADER:
+            try:
+                deadline_ms = min(deadline_ms, float(value))
+            except (TypeError, ValueError):
+                logger.warning("Cabeçalho %s inválido: %s", name, value)
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        deadline_ms = min(deadline_ms, context.get_remaining_time_in_millis())
+    return deadline_ms
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> AdmissionController:
+    """Retorna o controle de admissão do pipeline de visão, compartilhado no container."""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                stages=[
+                    StageTracker("rekognition", int(os.getenv("ADMISSION_REKOGNITION_CONCURRENCY", "10")), 400.0),
+                    StageTracker("bedrock", int(os.getenv("ADMISSION_BEDROCK_CONCURRENCY", "4")), 4000.0),
+                ],
+                # Completo: faces e rótulos no Rekognition e dicas no Bedrock; degradado: só faces
+                full_plan={"rekognition": 2, "bedrock": 1},
+                degraded_plan={"rekognition": 1},
+                # Em GIFs e vídeos, o Rekognition é chamado para cada quadro; as dicas, uma vez
+                per_frame_stages={"rekognition"},
+            )
+        return _controller
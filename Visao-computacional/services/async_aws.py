@@ -0,0 +1,348 @@
+"""
+Versão assíncrona da camada de serviços, para workers de longa duração (batch e varreduras).
+
+Usa o aiobotocore (dependência opcional, não incluída no pacote do Lambda):
+
+    pip install aiobotocore
+
+Os clientes são criados uma única vez por `AsyncClientPool` e compartilham o pool de
+conexões HTTP; semáforos por serviço limitam quantas chamadas ficam em voo ao mesmo tempo.
+As funções síncronas de `services.get_image` e `services.bedrock_runtime` continuam sendo a
+interface do Lambda e compartilham com esta versão a montagem das requisições e respostas.
+
+Exemplo:
+
+    async with AsyncClientPool(max_in_flight=300) as pool:
+        results = await analyze_images(pool, "meu-bucket", ["a.jpg", "b.jpg"])
+
+        # Lotes grandes: resultados à medida que ficam prontos, sem manter o lote na memória
+        async for result in iter_analyses(pool, "meu-bucket", image_names):
+            ...
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from services.bedrock_runtime import bedrock_breaker, build_native_request, model_id, parse_model_response
+from services.circuit_breaker import CircuitBreakerOpenError
+from services.credentials import get_credential_provider
+from services.get_image import (
+    HEADER_MAX_READ_BYTES, HEADER_READ_BYTES, build_image_key, cache_metadata, format_face_emotions,
+    format_image_details, get_cached_metadata,
+)
+from services.image_header import parse_image_header
+
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.credentials import AioCredentialResolver, AioDeferredRefreshableCredentials
+    from aiobotocore.session import get_session
+except ImportError:  # pragma: no cover - dependência opcional
+    AioConfig = None
+    AioCredentialResolver = None
+    AioDeferredRefreshableCredentials = None
+    get_session = None
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Limite padrão de chamadas simultâneas por worker
+ASYNC_MAX_IN_FLIGHT = int(os.getenv("ASYNC_MAX_IN_FLIGHT", "200"))
+# Imagens analisadas ao mesmo tempo em um lote (cada uma faz até 4 chamadas)
+ASYNC_IMAGE_WORKERS = int(os.getenv("ASYNC_IMAGE_WORKERS", "50"))
+
+
+async def _fetch_shared_credentials() -> dict:
+    """Lê as credenciais do provedor compartilhado sem bloquear o loop (a renovação pode fazer I/O)."""
+    return await asyncio.to_thread(get_credential_provider().get_credentials_metadata)
+
+
+class _SharedAsyncCredentialsSource:
+    """Componente `credential_provider` do aiobotocore com as credenciais do provedor compartilhado."""
+
+    METHOD = "shared-credential-provider"
+    CANONICAL_NAME = "SharedCredentialProvider"
+
+    async def load(self):
+        return AioDeferredRefreshableCredentials(refresh_using=_fetch_shared_credentials, method=self.METHOD)
+
+
+class AsyncClientPool:
+    """Clientes aiobotocore compartilhados, com um semáforo de concorrência por serviço."""
+
+    def __init__(self, region_name: Optional[str] = None, max_in_flight: int = ASYNC_MAX_IN_FLIGHT,
+                 service_limits: Optional[Dict[str, int]] = None):
+        if get_session is None:
+            raise ImportError("aiobotocore é necessário para a camada assíncrona: pip install aiobotocore")
+
+        self.region_name = region_name or os.getenv("AWS_REGION", "us-east-1")
+        self.max_in_flight = max_in_flight
+        self.service_limits = service_limits or {}
+
+        # Mesmas credenciais dos clientes síncronos (services.credentials), em vez da cadeia própria do aiobotocore
+        self._session = get_session()
+        self._session.register_component(
+            "credential_provider", AioCredentialResolver(providers=[_SharedAsyncCredentialsSource()])
+        )
+        self._stack = AsyncExitStack()
+        self._clients = {}
+        self._semaphores = {}
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def client(self, service: str):
+        """Retorna o cliente do serviço, criando-o na primeira chamada."""
+        if service not in self._clients:
+            async with self._lock:
+                if service not in self._clients:
+                    config = AioConfig(
+                        max_pool_connections=self.service_limits.get(service, self.max_in_flight),
+                        retries={"max_attempts": 3, "mode": "adaptive"},
+                    )
+                    self._clients[service] = await self._stack.enter_async_context(
+                        self._session.create_client(service, region_name=self.region_name, config=config)
+                    )
+        return self._clients[service]
+
+    def semaphore(self, service: str) -> asyncio.Semaphore:
+        """Semáforo que limita as chamadas em voo para o serviço."""
+        if service not in self._semaphores:
+            self._semaphores[service] = asyncio.Semaphore(self.service_limits.get(service, self.max_in_flight))
+        return self._semaphores[service]
+
+    async def close(self):
+        """Fecha todos os clientes e libera as conexões."""
+        await self._stack.aclose()
+        self._clients.clear()
+
+
+async def read_image_metadata_async(s3_client, bucket_name: str, image_key: str, head_response: dict) -> Dict[str, Any]:
+    """Versão assíncrona de `services.get_image.read_image_metadata` (mesmo cache por ETag)."""
+    etag = head_response.get("ETag")
+    if etag:
+        cached = get_cached_metadata(etag)
+        if cached is not None:
+            return cached
+
+    content_length = head_response.get("ContentLength", 0)
+    metadata = None
+    read_bytes = HEADER_READ_BYTES
+    while metadata is None:
+        request = {"Bucket": bucket_name, "Key": image_key, "Range": f"bytes=0-{read_bytes - 1}"}
+        if etag:
+            request["IfMatch"] = etag
+        response = await s3_client.get_object(**request)
+        async with response["Body"] as stream:
+            data = await stream.read()
+        metadata = parse_image_header(data)
+        if len(data) >= content_length or read_bytes >= HEADER_MAX_READ_BYTES:
+            break
+        read_bytes = HEADER_MAX_READ_BYTES
+
+    metadata = metadata or {"format": None, "width": None, "height": None}
+    if etag:
+        cache_metadata(etag, metadata)
+    return metadata
+
+
+async def get_image_details_async(pool: AsyncClientPool, bucket_name: str, image_name: str,
+                                  include_metadata: bool = False) -> Dict[str, Any]:
+    """Versão assíncrona de `services.get_image.get_image_details`."""
+    image_key = build_image_key(image_name)
+    s3_client = await pool.client("s3")
+
+    async with pool.semaphore("s3"):
+        try:
+            response = await s3_client.head_object(Bucket=bucket_name, Key=image_key)
+            details = format_image_details(bucket_name, image_key, response)
+            if include_metadata:
+                details.update(await read_image_metadata_async(s3_client, bucket_name, image_key, response))
+                details["size_bytes"] = response.get("ContentLength")
+        except (BotoCoreError, ClientError) as e:
+            return {"error": "Erro ao obter detalhes da imagem do S3", "message": str(e)}
+
+    return details
+
+
+async def detect_face_emotions_async(pool: AsyncClientPool, bucket_name: str, image_name: str) -> Dict[str, Any]:
+    """Versão assíncrona de `services.get_image.detect_face_emotions`."""
+    image_key = build_image_key(image_name)
+    rekognition = await pool.client("rekognition")
+
+    async with pool.semaphore("rekognition"):
+        try:
+            response = await rekognition.detect_faces(
+                Image={'S3Object': {'Bucket': bucket_name, 'Name': image_key}},
+                Attributes=['ALL']
+            )
+        except (BotoCoreError, ClientError) as e:
+            return {"error": "Erro ao detectar emoções faciais", "message": str(e)}
+
+    return format_face_emotions(response)
+
+
+async def detect_labels_async(pool: AsyncClientPool, bucket_name: str, image_name: str,
+                              max_labels: int = 10, min_confidence: float = 75) -> Dict[str, Any]:
+    """Detecta rótulos em uma imagem do S3 (mesmos parâmetros de `handler_pet.detect_labels`)."""
+    image_key = build_image_key(image_name)
+    rekognition = await pool.client("rekognition")
+
+    async with pool.semaphore("rekognition"):
+        try:
+            return await rekognition.detect_labels(
+                Image={"S3Object": {"Bucket": bucket_name, "Name": image_key}},
+                MaxLabels=max_labels,
+                MinConfidence=min_confidence,
+            )
+        except (BotoCoreError, ClientError) as e:
+            logger.error(f"Erro ao detectar rótulos: {str(e)}")
+            return {"error": str(e)}
+
+
+async def invoke_bedrock_model_async(pool: AsyncClientPool, prompt: str, max_tokens: int = 500,
+                                     temperature: float = 0.7, top_p: float = 0.9) -> str:
+    """
+    Versão assíncrona de `services.bedrock_runtime.invoke_bedrock_model`.
+
+    Compartilha o circuit breaker do Bedrock com a versão síncrona. Toda vaga reservada no
+    circuito é registrada ou devolvida, inclusive em cancelamentos (`asyncio.CancelledError`).
+    """
+    if not bedrock_breaker.allow_request():
+        raise CircuitBreakerOpenError("Circuito 'bedrock' aberto.")
+
+    start = None  # Definido quando a requisição é de fato enviada ao Bedrock
+    try:
+        native_request = build_native_request(prompt, max_tokens, temperature, top_p)
+        bedrock_client = await pool.client("bedrock-runtime")
+
+        async with pool.semaphore("bedrock-runtime"):
+            start = time.monotonic()
+            response = await bedrock_client.invoke_model(
+                modelId=model_id,
+                body=json.dumps(native_request),
+                contentType='application/json'
+            )
+            async with response['body'] as stream:
+                model_response = json.loads(await stream.read())
+    except Exception:
+        if start is None:
+            bedrock_breaker.release()  # Falhou antes de chamar o serviço
+        else:
+            bedrock_breaker.record_failure((time.monotonic() - start) * 1000)
+        raise
+    except BaseException:
+        bedrock_breaker.release()  # Cancelada: não conta como falha do serviço
+        raise
+
+    bedrock_breaker.record_success((time.monotonic() - start) * 1000)
+    return parse_model_response(model_response)
+
+
+async def _analyze_image(pool: AsyncClientPool, bucket_name: str, image_name: str) -> Dict[str, Any]:
+    details, emotions, labels = await asyncio.gather(
+        get_image_details_async(pool, bucket_name, image_name),
+        detect_face_emotions_async(pool, bucket_name, image_name),
+        detect_labels_async(pool, bucket_name, image_name),
+    )
+    return {
+        "imageName": image_name,
+        **details,
+        "emotions": emotions,
+        "labels": labels.get("Labels", []),
+    }
+
+
+async def _analyze_in_workers(pool: AsyncClientPool, bucket_name: str, image_names: Iterable[str],
+                              workers: int) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Analisa as imagens com `workers` consumidores de uma fila limitada, produzindo
+    `(posição, resultado)` na ordem em que as análises terminam.
+
+    Só `workers` imagens ficam em andamento e a fila lê `image_names` sob demanda, então
+    a memória não cresce com o tamanho do lote. Se o consumidor parar antes do fim, as
+    análises pendentes são canceladas.
+    """
+    workers = max(1, workers)
+    pending = asyncio.Queue(maxsize=workers)
+    finished = asyncio.Queue()
+    worker_done = object()
+
+    async def produce():
+        error = None
+        try:
+            for item in enumerate(image_names):
+                await pending.put(item)
+        except Exception as e:
+            error = e  # Encerra os consumidores antes de propagar
+        for _ in range(workers):
+            await pending.put(None)
+        if error is not None:
+            raise error
+
+    async def work():
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                index, image_name = item
+                try:
+                    result = await _analyze_image(pool, bucket_name, image_name)
+                except Exception as e:
+                    logger.error("Erro ao analisar %s: %s", image_name, e)
+                    result = {"imageName": image_name, "error": str(e)}
+                finished.put_nowait((index, result))
+        finally:
+            finished.put_nowait(worker_done)
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(workers)]
+    try:
+        running = workers
+        while running:
+            item = await finished.get()
+            if item is worker_done:
+                running -= 1
+            else:
+                yield item
+        await asyncio.gather(*tasks)  # Propaga a falha ao ler `image_names`
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def iter_analyses(pool: AsyncClientPool, bucket_name: str, image_names: Iterable[str],
+                        workers: int = ASYNC_IMAGE_WORKERS) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Obtém detalhes, emoções e rótulos das imagens, produzindo cada resultado assim que fica pronto.
+
+    No máximo `workers` imagens são analisadas ao mesmo tempo. Uma falha inesperada em uma
+    imagem vira `{"imageName", "error"}` no resultado dela, sem interromper o restante do lote.
+    """
+    async for _, result in _analyze_in_workers(pool, bucket_name, image_names, workers):
+        yield result
+
+
+async def analyze_images(pool: AsyncClientPool, bucket_name: str, image_names: List[str],
+                         workers: int = ASYNC_IMAGE_WORKERS) -> List[Dict[str, Any]]:
+    """
+    Obtém detalhes, emoções e rótulos de várias imagens em paralelo, na ordem de `image_names`.
+
+    Mesmo limite de `iter_analyses` (`workers` imagens por vez). Uma falha inesperada em uma
+    imagem vira `{"imageName", "error"}` no resultado dela, sem interromper o restante do lote.
+    """
+    results = [None] * len(image_names)
+    async for index, result in _analyze_in_workers(pool, bucket_name, image_names, workers):
+        results[index] = result
+    return results
@@ -1,50 +1,117 @@
 import json
-import boto3
 import logging
 import os
+import time
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
+from services.circuit_breaker import CircuitBreaker
+from services.region_pool import RegionClientPool, ALLOWED_REGIONS
+
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Inicializa a sessão e o cliente Bedrock Runtime
-session = boto3.Session(region_name='us-east-1')  # Certifique-se de usar a região correta
-bedrock_client = session.client('bedrock-runtime')
-
-# Exemplo de invocação do modelo Titan Text G1 - Express
-model_id = 'amazon.titan-text-express-v1'  # ID correto do modelo Titan Text G1 - Express
-input_text = "Um exemplo de descrição para gerar um texto."  # Texto de exemplo
-
-# Estrutura do corpo da requisição para geração de texto
-native_request = {
-    "inputText": input_text,
-    "textGenerationConfig": {
-        "maxTokenCount": 500,  # Ajuste o número máximo de tokens gerados
-        "temperature": 0.7,    # Controla a aleatoriedade das respostas (0.0 para determinístico)
-        "topP": 0.9,           # Top-p sampling para limitar a probabilidade cumulativa
-    },
-}
-
-logger.info(f"Iniciando a invocação do modelo: {model_id} com texto: {input_text}")
-
-try:
-    # Invocação do modelo de geração de texto
-    response = bedrock_client.invoke_model(
-        modelId=model_id,
-        body=json.dumps(native_request),
-        contentType='application/json'
-    )
-
-    # Processando a resposta
-    model_response = json.loads(response['body'].read())
-    logger.info(f"Resposta do modelo: {model_response}")
-    print(f"Texto gerado: {model_response}")
-
-except ClientError as e:
-    logger.error(f"Erro ao invocar o modelo: {e}")
-    print({"error": "Erro ao invocar o modelo no Bedrock", "message": str(e)})
-
-except Exception as e:
-    logger.error(f"Erro inesperado: {e}")
-    print({"error": "Erro inesperado ao invocar o modelo", "message": str(e)})
+# Tempo máximo de espera pelo Bedrock: chamadas lentas não devem prender a concorrência do Lambda
+BEDROCK_TIMEOUT = float(os.getenv("BEDROCK_TIMEOUT", "10"))
+
+# Regiões em que o modelo está habilitado (padrão: as regiões permitidas do serviço)
+BEDROCK_REGIONS = [region.strip() for region in os.getenv("BEDROCK_REGIONS", "").split(",") if region.strip()]
+
+# Abaixo desse tempo restante (s) o Bedrock nem é chamado: as dicas de contingência são usadas
+BEDROCK_MIN_SECONDS = float(os.getenv("BEDROCK_MIN_SECONDS", "2"))
+
+# Clientes Bedrock Runtime por região, com roteamento pela região mais saudável e failover.
+# Uma única tentativa por região: o failover substitui os retries, e cada chamada espera
+# no máximo BEDROCK_TIMEOUT (ou o prazo restante da requisição, se menor).
+bedrock_pool = RegionClientPool(
+    'bedrock-runtime',
+    regions=BEDROCK_REGIONS or ALLOWED_REGIONS,
+    config=Config(connect_timeout=2, read_timeout=BEDROCK_TIMEOUT, retries={"total_max_attempts": 1}),
+)
+
+# Circuit breaker do container. Um container Lambda atende uma requisição por vez (no máximo
+# uma chamada ao Bedrock), por isso poucas chamadas na janela já bastam para avaliar o circuito;
+# ele só abre após BEDROCK_CB_MIN_FAILURES falhas, e não com um sucesso e uma falha.
+bedrock_breaker = CircuitBreaker(
+    "bedrock",
+    failure_rate_threshold=float(os.getenv("BEDROCK_CB_FAILURE_RATE", "0.5")),
+    slow_call_threshold_ms=float(os.getenv("BEDROCK_CB_SLOW_CALL_MS", "8000")),
+    window_size=int(os.getenv("BEDROCK_CB_WINDOW", "10")),
+    min_calls=int(os.getenv("BEDROCK_CB_MIN_CALLS", "2")),
+    min_failures=int(os.getenv("BEDROCK_CB_MIN_FAILURES", "2")),
+    open_timeout=float(os.getenv("BEDROCK_CB_OPEN_SECONDS", "30")),
+)
+
+# ID do modelo Titan Text G1 - Express
+model_id = 'amazon.titan-text-express-v1'
+
+
+def build_native_request(prompt: str, max_tokens: int = 500, temperature: float = 0.7, top_p: float = 0.9) -> dict:
+    """Estrutura do corpo da requisição para geração de texto."""
+    return {
+        "inputText": prompt,
+        "textGenerationConfig": {
+            "maxTokenCount": max_tokens,  # Ajuste o número máximo de tokens gerados
+            "temperature": temperature,   # Controla a aleatoriedade das respostas (0.0 para determinístico)
+            "topP": top_p,                # Top-p sampling para limitar a probabilidade cumulativa
+        },
+    }
+
+
+def parse_model_response(model_response: dict) -> str:
+    """Extrai o texto gerado da resposta do modelo Titan."""
+    return model_response["results"][0]["outputText"]
+
+
+def invoke_bedrock_model(prompt: str, max_tokens: int = 500, temperature: float = 0.7, top_p: float = 0.9,
+                         deadline: float = None) -> str:
+    """
+    Invoca o modelo de texto do Bedrock protegido pelo circuit breaker.
+
+    Args:
+        prompt (str): Texto enviado ao modelo.
+        max_tokens (int): Número máximo de tokens gerados.
+        temperature (float): Aleatoriedade das respostas (0.0 para determinístico).
+        top_p (float): Top-p sampling para limitar a probabilidade cumulativa.
+        deadline (float): Instante (`time.monotonic()`) em que a requisição precisa responder.
+
+    Returns:
+        str: Texto gerado pelo modelo.
+
+    Raises:
+        CircuitBreakerOpenError: Se o circuito estiver aberto (falha imediata).
+        TimeoutError: Se não houver tempo restante suficiente para chamar o modelo.
+        ClientError: Se a chamada ao Bedrock falhar.
+    """
+    if deadline is not None and deadline - time.monotonic() < BEDROCK_MIN_SECONDS:
+        raise TimeoutError("Tempo restante insuficiente para invocar o Bedrock.")
+
+    native_request = build_native_request(prompt, max_tokens, temperature, top_p)
+
+    def _invoke():
+        response = bedrock_pool.call(
+            "invoke_model",
+            deadline=deadline,
+            modelId=model_id,
+            body=json.dumps(native_request),
+            contentType='application/json'
+        )
+        return parse_model_response(json.loads(response['body'].read()))
+
+    return bedrock_breaker.call(_invoke)
+
+
+if __name__ == "__main__":
+    # Exemplo de invocação do modelo Titan Text G1 - Express
+    input_text = "Um exemplo de descrição para gerar um texto."
+    logger.info(f"Iniciando a invocação do modelo: {model_id} com texto: {input_text}")
+
+    try:
+        print(f"Texto gerado: {invoke_bedrock_model(input_text)}")
+    except ClientError as e:
+        logger.error(f"Erro ao invocar o modelo: {e}")
+        print({"error": "Erro ao invocar o modelo no Bedrock", "message": str(e)})
+    except Exception as e:
+        logger.error(f"Erro inesperado: {e}")
+        print({"error": "Erro inesperado ao invocar o modelo", "message": str(e)})
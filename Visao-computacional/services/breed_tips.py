@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Resumos estáticos usados quando o Bedrock está indisponível e não há dicas em cache
+STATIC_BREED_SUMMARIES = {
+    "Border Collie": (
+        "Nível de Energia e Necessidades de Exercícios: muito alto; precisa de atividades físicas e mentais diárias.\n"
+        "Temperamento e Comportamento: inteligente, atento e muito ligado ao tutor.\n"
+        "Cuidados e Necessidades: escovação semanal e tarefas que estimulem o raciocínio.\n"
+        "Problemas de Saúde Comuns: displasia de quadril, anomalia do olho do collie e epilepsia."
+    ),
+    "German Shepherd": (
+        "Nível de Energia e Necessidades de Exercícios: alto; caminhadas longas e treinos diários.\n"
+        "Temperamento e Comportamento: leal, protetor e fácil de treinar.\n"
+        "Cuidados e Necessidades: escovação frequente, principalmente na troca de pelos.\n"
+        "Problemas de Saúde Comuns: displasia de quadril e cotovelo e mielopatia degenerativa."
+    ),
+    "Australian Shepherd": (
+        "Nível de Energia e Necessidades de Exercícios: muito alto; gosta de correr e de esportes caninos.\n"
+        "Temperamento e Comportamento: ativo, inteligente e reservado com estranhos.\n"
+        "Cuidados e Necessidades: escovação semanal e socialização desde filhote.\n"
+        "Problemas de Saúde Comuns: displasia de quadril, catarata e sensibilidade a alguns medicamentos."
+    ),
+    "Collie": (
+        "Nível de Energia e Necessidades de Exercícios: moderado; caminhadas diárias e brincadeiras.\n"
+        "Temperamento e Comportamento: gentil, sensível e ótimo com crianças.\n"
+        "Cuidados e Necessidades: pelagem longa que exige escovação frequente.\n"
+        "Problemas de Saúde Comuns: anomalia do olho do collie e atrofia progressiva da retina."
+    ),
+    "Shetland Sheepdog": (
+        "Nível de Energia e Necessidades de Exercícios: alto; exercícios diários e jogos de agilidade.\n"
+        "Temperamento e Comportamento: dócil, vocal e muito obediente.\n"
+        "Cuidados e Necessidades: escovação frequente da pelagem dupla.\n"
+        "Problemas de Saúde Comuns: hipotireoidismo, displasia de quadril e problemas oculares."
+    ),
+}
+
+DEFAULT_SUMMARY = (
+    "Cães pastores costumam ter muita energia e inteligência: ofereça exercícios diários, "
+    "estímulo mental, escovação regular e acompanhamento veterinário periódico."
+)
+
+
+def get_static_summary(breed: str) -> str:
+    """Retorna o resumo estático da raça ou um resumo genérico para cães pastores."""
+    return STATIC_BREED_SUMMARIES.get(breed, DEFAULT_SUMMARY)
+
+
+class TipsCache:
+    """Cache LRU em memória das últimas dicas válidas geradas pelo Bedrock, por raça."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # raça -> (dicas, timestamp)
+        self._lock = threading.Lock()
+
+    def get(self, breed: str) -> Optional[str]:
+        """Retorna as últimas dicas conhecidas para a raça, se houver."""
+        with self._lock:
+            entry = self._entries.get(breed)
+            if entry is None:
+                return None
+            self._entries.move_to_end(breed)
+            return entry[0]
+
+    def put(self, breed: str, tips: str):
+        """Armazena as dicas mais recentes da raça."""
+        with self._lock:
+            self._entries[breed] = (tips, time.time())
+            self._entries.move_to_end(breed)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def snapshot(self) -> Dict[str, str]:
+        """Retorna uma cópia das dicas em cache."""
+        with self._lock:
+            return {breed: tips for breed, (tips, _) in self._entries.items()}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Cache compartilhado pelo container Lambda
+tips_cache = TipsCache()
+
+
+def get_fallback_tips(breed: str) -> dict:
+    """Dicas de contingência: última resposta válida da raça ou resumo estático."""
+    cached = tips_cache.get(breed)
+    if cached is not None:
+        return {"Dicas": cached, "origem_dicas": "cache"}
+    return {"Dicas": get_static_summary(breed), "origem_dicas": "resumo_estatico"}
@@ -0,0 +1,147 @@
+import logging
+import threading
+import time
+from collections import deque
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreakerOpenError(Exception):
+    """Erro lançado quando o circuito está aberto e a chamada é rejeitada sem esperar."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker baseado em taxa de erro e latência das últimas chamadas.
+
+    Estados:
+        closed: as chamadas passam normalmente e são contabilizadas na janela.
+        open: as chamadas falham imediatamente com CircuitBreakerOpenError.
+        half_open: após `open_timeout` segundos, poucas chamadas de teste passam;
+                   se tiverem sucesso o circuito fecha, senão volta a abrir.
+
+    O circuito só abre com pelo menos `min_calls` chamadas na janela e `min_failures` falhas
+    (ou chamadas lentas): em janelas pequenas, uma falha isolada já atingiria a taxa.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5,
+                 slow_call_threshold_ms: float = 5000, slow_call_rate_threshold: float = 0.5,
+                 window_size: int = 20, min_calls: int = 5, min_failures: int = 1, open_timeout: float = 30,
+                 half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold_ms = slow_call_threshold_ms
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.min_calls = min_calls
+        self.min_failures = min_failures
+        self.open_timeout = open_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._window = deque(maxlen=window_size)  # Tuplas (falhou, lenta)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """Estado atual do circuito, já considerando a passagem para half_open."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.open_timeout:
+            logger.info("Circuito '%s' em half_open: testando recuperação.", self.name)
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        logger.warning("Circuito '%s' aberto: chamadas serão rejeitadas por %ss.", self.name, self.open_timeout)
+
+    def allow_request(self) -> bool:
+        """Indica se uma chamada pode ser feita agora (reserva uma vaga de teste em half_open)."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                return True
+            return False
+
+    def release(self):
+        """
+        Devolve a vaga reservada por `allow_request` sem registrar resultado.
+
+        Para chamadas que nem chegaram ao serviço ou foram canceladas: em half_open, a vaga
+        de teste volta a ficar disponível em vez de travar o circuito.
+        """
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls > 0:
+                self._half_open_calls -= 1
+
+    def record_success(self, latency_ms: float):
+        """Registra uma chamada bem-sucedida e sua latência."""
+        slow = latency_ms >= self.slow_call_threshold_ms
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                if slow:
+                    self._open()
+                else:
+                    logger.info("Circuito '%s' fechado: serviço recuperado.", self.name)
+                    self._state = self.CLOSED
+                    self._window.clear()
+                return
+            self._window.append((False, slow))
+            self._evaluate()
+
+    def record_failure(self, latency_ms: float):
+        """Registra uma chamada com erro."""
+        slow = latency_ms >= self.slow_call_threshold_ms
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._open()
+                return
+            self._window.append((True, slow))
+            self._evaluate()
+
+    def _evaluate(self):
+        total = len(self._window)
+        if self._state != self.CLOSED or total < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self._window if failed)
+        slow_calls = sum(1 for _, slow in self._window if slow)
+        failure_rate = failures / total
+        slow_rate = slow_calls / total
+        if ((failures >= self.min_failures and failure_rate >= self.failure_rate_threshold)
+                or (slow_calls >= self.min_failures and slow_rate >= self.slow_call_rate_threshold)):
+            logger.warning("Circuito '%s': taxa de erro %.2f, taxa de lentidão %.2f.",
+                           self.name, failure_rate, slow_rate)
+            self._open()
+
+    def call(self, func, *args, **kwargs):
+        """Executa `func` protegida pelo circuito, medindo latência e erros."""
+        if not self.allow_request():
+            raise CircuitBreakerOpenError(f"Circuito '{self.name}' aberto.")
+
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure((time.monotonic() - start) * 1000)
+            raise
+        except BaseException:
+            self.release()  # Interrompida (ex.: KeyboardInterrupt): não conta como falha
+            raise
+        self.record_success((time.monotonic() - start) * 1000)
+        return result
@@ -0,0 +1,163 @@
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import boto3
+import botocore.session
+from botocore.credentials import CredentialProvider, CredentialResolver, DeferredRefreshableCredentials
+from botocore.exceptions import BotoCoreError, ClientError, NoCredentialsError
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Validade assumida para credenciais sem expiração (chaves fixas, variáveis de ambiente do Lambda)
+STATIC_CREDENTIALS_TTL = int(os.getenv("STATIC_CREDENTIALS_TTL", "3600"))
+# Intervalo entre verificações do refresh em segundo plano
+CREDENTIALS_CHECK_INTERVAL = int(os.getenv("CREDENTIALS_CHECK_INTERVAL", "60"))
+
+
+class _SharedCredentialsSource(CredentialProvider):
+    """Componente `credential_provider` do botocore que devolve as credenciais compartilhadas."""
+
+    METHOD = "shared-credential-provider"
+    CANONICAL_NAME = "SharedCredentialProvider"
+
+    def __init__(self, credentials):
+        super().__init__()
+        self._credentials = credentials
+
+    def load(self):
+        return self._credentials
+
+
+class SharedCredentialProvider:
+    """
+    Credenciais AWS compartilhadas por todos os clientes do processo.
+
+    As credenciais são resolvidas pela cadeia padrão do botocore (variáveis de ambiente,
+    ~/.aws/credentials, SSO, perfil com assume role, metadados do container/EC2) e mantidas
+    em um `DeferredRefreshableCredentials`. Todos os clientes criados pela `session` deste provedor
+    leem as mesmas credenciais congeladas; o botocore as renova antes da expiração e uma
+    thread em segundo plano antecipa essa renovação, para que ela não aconteça no meio de
+    uma requisição nem deixe um token expirado derrubar um processamento longo.
+    """
+
+    def __init__(self, region_name: str = None, profile_name: str = None):
+        self.region_name = region_name or os.getenv("AWS_REGION", "us-east-1")
+        self.profile_name = profile_name
+        # Resolvidas só no primeiro uso: importar um handler não exige credenciais
+        self._credentials = DeferredRefreshableCredentials(
+            refresh_using=self._fetch_credentials,
+            method="shared-credential-provider",
+        )
+
+        # A sessão resolve credenciais só pelo componente registrado: sempre as compartilhadas
+        botocore_session = botocore.session.Session(profile=profile_name)
+        botocore_session.register_component(
+            "credential_provider", CredentialResolver(providers=[_SharedCredentialsSource(self._credentials)])
+        )
+        self.session = boto3.Session(botocore_session=botocore_session, region_name=self.region_name)
+
+        self._metadata = None
+        self._refresh_thread = None
+        self._stop = threading.Event()
+
+    def _fetch_credentials(self) -> dict:
+        """Resolve credenciais novas pela cadeia padrão (chamado na criação e a cada renovação)."""
+        credentials = botocore.session.Session(profile=self.profile_name).get_credentials()
+        if credentials is None:
+            raise NoCredentialsError()
+
+        frozen = credentials.get_frozen_credentials()
+        expiry = getattr(credentials, "_expiry_time", None)
+        if expiry is None:
+            expiry = datetime.now(timezone.utc) + timedelta(seconds=STATIC_CREDENTIALS_TTL)
+
+        logger.info("Credenciais AWS resolvidas (%s), válidas até %s.", credentials.method, expiry.isoformat())
+        self._metadata = {
+            "access_key": frozen.access_key,
+            "secret_key": frozen.secret_key,
+            "token": frozen.token,
+            "expiry_time": expiry.isoformat(),
+        }
+        return dict(self._metadata)
+
+    def get_frozen_credentials(self):
+        """Credenciais atuais (renovadas automaticamente se estiverem perto de expirar)."""
+        return self._credentials.get_frozen_credentials()
+
+    def get_credentials_metadata(self) -> dict:
+        """
+        Credenciais atuais com a expiração, no formato de `refresh_using` do botocore
+        (access_key, secret_key, token, expiry_time). Usado pela camada assíncrona.
+        """
+        self._credentials.get_frozen_credentials()  # Resolve ou renova, se necessário
+        return dict(self._metadata)
+
+    def client(self, service: str, **kwargs):
+        """Cria um cliente boto3 que usa as credenciais compartilhadas."""
+        return self.session.client(service, **kwargs)
+
+    def start_background_refresh(self, interval: int = CREDENTIALS_CHECK_INTERVAL):
+        """Inicia a thread que antecipa a renovação das credenciais."""
+        if self._refresh_thread is not None:
+            return
+
+        def _loop():
+            while not self._stop.wait(interval):
+                try:
+                    self._credentials.get_frozen_credentials()  # Renova se estiver na janela de renovação
+                except Exception as e:
+                    logger.warning("Falha ao renovar credenciais em segundo plano: %s", e)
+
+        self._refresh_thread = threading.Thread(target=_loop, name="credential-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+    def check_connectivity(self) -> bool:
+        """
+        Verifica credenciais e conectividade com o STS GetCallerIdentity.
+
+        Não exige permissões IAM e não percorre recursos da conta, ao contrário de listar buckets.
+        """
+        try:
+            identity = self.client("sts").get_caller_identity()
+            logger.info("Conectado à AWS como %s.", identity.get("Arn"))
+            return True
+        except (BotoCoreError, ClientError) as e:
+            logger.error("Falha ao verificar a conexão com a AWS: %s", e)
+            return False
+
+
+_provider = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_credential_provider() -> SharedCredentialProvider:
+    """Retorna o provedor compartilhado do processo, criando-o (e a thread de refresh) na primeira chamada."""
+    global _provider
+    if _provider is None:
+        with _lock:
+            if _provider is None:
+                _provider = SharedCredentialProvider()
+                _provider.start_background_refresh()
+    return _provider
+
+
+def get_client(service: str, region_name: str = None, **kwargs):
+    """
+    Retorna um cliente compartilhado do serviço, criado com as credenciais do provedor.
+
+    Clientes com os mesmos parâmetros são reaproveitados (o boto3 client é thread-safe).
+    """
+    provider = get_credential_provider()
+    key = (service, region_name or provider.region_name, tuple(sorted(kwargs.items(), key=lambda item: item[0])))
+    with _lock:
+        if key not in _clients:
+            _clients[key] = provider.client(service, region_name=key[1], **kwargs)
+        return _clients[key]
@@ -0,0 +1,350 @@
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import List, Optional
+
+import numpy as np
+
+from services.credentials import get_client
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: só o lock entre threads
+    fcntl = None
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tabela DynamoDB com contadores atômicos, compartilhada por todos os containers (produção)
+STATS_TABLE = os.getenv("STATS_TABLE")
+# Diretório dos agregados locais, usado sem STATS_TABLE (um arquivo .npz por pasta)
+STATS_DIR = os.getenv("STATS_DIR", "/tmp/emotion_stats")
+
+# Tipos de emoção retornados pelo Rekognition, na ordem das colunas dos arrays
+EMOTIONS = ["HAPPY", "SAD", "ANGRY", "CONFUSED", "DISGUSTED", "SURPRISED", "CALM", "FEAR"]
+EMOTION_INDEX = {emotion: i for i, emotion in enumerate(EMOTIONS)}
+HISTOGRAM_BINS = 10  # Faixas de 10 pontos de Confidence (0-10, ..., 90-100)
+
+
+def _day_to_int(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _int_to_day(value: int) -> str:
+    return f"{value // 10000:04d}-{value // 100 % 100:02d}-{value % 100:02d}"
+
+
+class FolderStats:
+    """
+    Agregados de emoções de uma pasta, uma linha por dia.
+
+    Arrays (D = número de dias, E = número de emoções):
+        days (D,): dia no formato AAAAMMDD.
+        totals (D, 2): imagens analisadas e faces detectadas.
+        dominant (D, E): faces em que cada emoção foi a de maior confiança.
+        confidence_sum (D, E): soma da Confidence de cada emoção em todas as faces.
+        histogram (D, E, HISTOGRAM_BINS): distribuição da Confidence de cada emoção.
+    """
+
+    def __init__(self):
+        emotions = len(EMOTIONS)
+        self.days = np.zeros(0, dtype=np.int32)
+        self.totals = np.zeros((0, 2), dtype=np.int64)
+        self.dominant = np.zeros((0, emotions), dtype=np.int64)
+        self.confidence_sum = np.zeros((0, emotions), dtype=np.float64)
+        self.histogram = np.zeros((0, emotions, HISTOGRAM_BINS), dtype=np.int64)
+
+    def _row(self, day: int) -> int:
+        """Índice da linha do dia, criando-a (em ordem) se necessário."""
+        position = int(np.searchsorted(self.days, day))
+        if position < len(self.days) and self.days[position] == day:
+            return position
+
+        self.days = np.insert(self.days, position, day)
+        self.totals = np.insert(self.totals, position, 0, axis=0)
+        self.dominant = np.insert(self.dominant, position, 0, axis=0)
+        self.confidence_sum = np.insert(self.confidence_sum, position, 0, axis=0)
+        self.histogram = np.insert(self.histogram, position, 0, axis=0)
+        return position
+
+    def update(self, day: int, confidences: np.ndarray):
+        """
+        Soma uma imagem analisada aos agregados do dia.
+
+        Args:
+            day (int): Dia no formato AAAAMMDD.
+            confidences (np.ndarray): Matriz (faces, emoções) com a Confidence de cada emoção.
+        """
+        row = self._row(day)
+        totals, dominant, confidence_sum, histogram = _image_counters(confidences)
+        self.totals[row] += totals
+        self.dominant[row] += dominant
+        self.confidence_sum[row] += confidence_sum
+        self.histogram[row] += histogram
+
+    def select(self, start: Optional[int] = None, end: Optional[int] = None) -> np.ndarray:
+        """Máscara booleana dos dias dentro do intervalo [start, end]."""
+        mask = np.ones(len(self.days), dtype=bool)
+        if start is not None:
+            mask &= self.days >= start
+        if end is not None:
+            mask &= self.days <= end
+        return mask
+
+    def save(self, path: str):
+        """Grava os arrays em um .npz de forma atômica."""
+        temp_path = f"{path}.tmp.npz"
+        np.savez(temp_path, days=self.days, totals=self.totals, dominant=self.dominant,
+                 confidence_sum=self.confidence_sum, histogram=self.histogram)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "FolderStats":
+        stats = cls()
+        with np.load(path) as data:
+            stats.days = data["days"]
+            stats.totals = data["totals"]
+            stats.dominant = data["dominant"]
+            stats.confidence_sum = data["confidence_sum"]
+            stats.histogram = data["histogram"]
+        return stats
+
+
+def _image_counters(confidences: np.ndarray):
+    """Contadores de uma imagem: (totals (2,), dominant (E,), confidence_sum (E,), histogram (E, HISTOGRAM_BINS))."""
+    emotions = len(EMOTIONS)
+    faces = confidences.shape[0]
+    totals = np.array([1, faces], dtype=np.int64)
+    dominant = np.zeros(emotions, dtype=np.int64)
+    histogram = np.zeros((emotions, HISTOGRAM_BINS), dtype=np.int64)
+    if faces:
+        dominant += np.bincount(confidences.argmax(axis=1), minlength=emotions)
+        bins = np.minimum((confidences // (100 / HISTOGRAM_BINS)).astype(np.int64), HISTOGRAM_BINS - 1)
+        emotion_columns = np.broadcast_to(np.arange(emotions), bins.shape)
+        np.add.at(histogram, (emotion_columns.ravel(), bins.ravel()), 1)
+    return totals, dominant, confidences.sum(axis=0), histogram
+
+
+def _confidence_matrix(face_emotions: List[List[dict]]) -> np.ndarray:
+    """Matriz (faces, emoções) com a Confidence de cada emoção, a partir das listas `Emotions` do Rekognition."""
+    confidences = np.zeros((len(face_emotions), len(EMOTIONS)), dtype=np.float64)
+    for face, emotions in enumerate(face_emotions):
+        for emotion in emotions:
+            column = EMOTION_INDEX.get(emotion.get("Type"))
+            if column is not None:
+                confidences[face, column] = emotion.get("Confidence", 0.0)
+    return confidences
+
+
+def _folder_of(image_key: str) -> str:
+    return image_key.rsplit("/", 1)[0] if "/" in image_key else ""
+
+
+def _summarize(totals: np.ndarray, dominant: np.ndarray, confidence_sum: np.ndarray, histogram: np.ndarray) -> dict:
+    """Converte agregados (já somados) nas métricas expostas pela API."""
+    images, faces = int(totals[0]), int(totals[1])
+    return {
+        "images": images,
+        "faces": faces,
+        "faces_per_image": round(faces / images, 4) if images else 0.0,
+        "emotions": {
+            emotion: {
+                "share": round(float(dominant[i]) / faces, 4) if faces else 0.0,
+                "mean_confidence": round(float(confidence_sum[i]) / faces, 4) if faces else 0.0,
+                "histogram": histogram[i].tolist(),
+            }
+            for i, emotion in enumerate(EMOTIONS)
+        },
+    }
+
+
+def _summarize_folder(folder: str, stats: FolderStats, start: Optional[date], end: Optional[date],
+                      granularity: str) -> dict:
+    """Métricas da pasta no intervalo [start, end], por dia ou totalizadas."""
+    mask = stats.select(_day_to_int(start) if start else None, _day_to_int(end) if end else None)
+    days = stats.days[mask]
+    totals = stats.totals[mask]
+    dominant = stats.dominant[mask]
+    confidence_sum = stats.confidence_sum[mask]
+    histogram = stats.histogram[mask]
+
+    if granularity == "total":
+        return {"folder": folder, "total": _summarize(totals.sum(axis=0), dominant.sum(axis=0),
+                                                      confidence_sum.sum(axis=0), histogram.sum(axis=0))}
+
+    return {
+        "folder": folder,
+        "days": [
+            {"day": _int_to_day(int(days[i])), **_summarize(totals[i], dominant[i], confidence_sum[i], histogram[i])}
+            for i in range(len(days))
+        ],
+    }
+
+
+class EmotionStats:
+    """
+    Estatísticas de emoções por pasta e por dia em arquivos .npz locais (servidor local, testes).
+
+    Cada gravação relê o arquivo sob um lock de arquivo, soma a imagem e grava de novo, e cada
+    consulta lê o arquivo atual: vários processos na mesma máquina não sobrescrevem os dados
+    uns dos outros. Containers diferentes não compartilham o diretório; para isso, use `STATS_TABLE`.
+    """
+
+    def __init__(self, directory: str = STATS_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, folder: str) -> str:
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", folder) or "_root"
+        return os.path.join(self.directory, f"{safe_name}.npz")
+
+    @contextmanager
+    def _file_lock(self, folder: str):
+        with self._lock, open(f"{self._path(folder)}.lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _load(self, folder: str) -> FolderStats:
+        path = self._path(folder)
+        return FolderStats.load(path) if os.path.exists(path) else FolderStats()
+
+    def record_analysis(self, image_key: str, face_emotions: List[List[dict]], analyzed_at: Optional[datetime] = None):
+        """
+        Registra uma imagem analisada.
+
+        Args:
+            image_key (str): Caminho da imagem no bucket (a pasta é o prefixo).
+            face_emotions (list): Para cada face, a lista `Emotions` completa do Rekognition.
+            analyzed_at (datetime): Momento da análise (padrão: agora, em UTC).
+        """
+        confidences = _confidence_matrix(face_emotions)
+        folder = _folder_of(image_key)
+        day = _day_to_int((analyzed_at or datetime.now(timezone.utc)).date())
+
+        with self._file_lock(folder):
+            stats = self._load(folder)
+            stats.update(day, confidences)
+            stats.save(self._path(folder))
+
+    def summary(self, folder: str, start: Optional[date] = None, end: Optional[date] = None,
+                granularity: str = "day") -> dict:
+        """
+        Retorna as métricas da pasta no intervalo, por dia ou totalizadas.
+
+        Args:
+            folder (str): Pasta do bucket.
+            start (date): Primeiro dia (inclusive).
+            end (date): Último dia (inclusive).
+            granularity (str): "day" para uma entrada por dia ou "total" para o período inteiro.
+        """
+        with self._file_lock(folder.strip("/")):
+            stats = self._load(folder.strip("/"))
+        return _summarize_folder(folder, stats, start, end, granularity)
+
+
+class DynamoDBEmotionStats:
+    """
+    Estatísticas de emoções em uma tabela DynamoDB, compartilhada por todos os containers.
+
+    Um item por pasta e dia (chave de partição `pk` = `folder#<pasta>`, de ordenação `day`
+    = AAAAMMDD). Cada análise soma seus contadores com `UpdateItem ... ADD`, que é atômico:
+    gravações simultâneas de containers diferentes nunca se sobrescrevem. A consulta lê os
+    dias do intervalo e agrega em NumPy.
+
+    Atributos: `images`, `faces`, `dominant_<EMOÇÃO>`, `confidence_<EMOÇÃO>` e
+    `histogram_<EMOÇÃO>_<faixa>`.
+    """
+
+    def __init__(self, table_name: str = STATS_TABLE):
+        self.table_name = table_name
+        self.dynamodb = get_client("dynamodb")
+
+    @staticmethod
+    def _pk(folder: str) -> str:
+        return f"folder#{folder}"
+
+    def record_analysis(self, image_key: str, face_emotions: List[List[dict]], analyzed_at: Optional[datetime] = None):
+        """Registra uma imagem analisada (mesmos argumentos de `EmotionStats.record_analysis`)."""
+        totals, dominant, confidence_sum, histogram = _image_counters(_confidence_matrix(face_emotions))
+        counters = {"images": int(totals[0]), "faces": int(totals[1])}
+        for i, emotion in enumerate(EMOTIONS):
+            counters[f"dominant_{emotion}"] = int(dominant[i])
+            counters[f"confidence_{emotion}"] = round(float(confidence_sum[i]), 6)
+            for bin_index in range(HISTOGRAM_BINS):
+                counters[f"histogram_{emotion}_{bin_index}"] = int(histogram[i, bin_index])
+        counters = {name: value for name, value in counters.items() if value}
+
+        names = {f"#c{i}": name for i, name in enumerate(counters)}
+        values = {f":c{i}": {"N": str(value)} for i, value in enumerate(counters.values())}
+        day = _day_to_int((analyzed_at or datetime.now(timezone.utc)).date())
+        self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key={"pk": {"S": self._pk(_folder_of(image_key))}, "day": {"N": str(day)}},
+            UpdateExpression="ADD " + ", ".join(f"#c{i} :c{i}" for i in range(len(counters))),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def _load(self, folder: str, start: Optional[int], end: Optional[int]) -> FolderStats:
+        key_condition = "pk = :pk"
+        values = {":pk": {"S": self._pk(folder)}}
+        if start is not None or end is not None:
+            key_condition += " AND #day BETWEEN :start AND :end"
+            values[":start"] = {"N": str(start if start is not None else 0)}
+            values[":end"] = {"N": str(end if end is not None else 99991231)}
+
+        kwargs = {"TableName": self.table_name, "KeyConditionExpression": key_condition,
+                  "ExpressionAttributeValues": values, "ConsistentRead": True}
+        if start is not None or end is not None:
+            kwargs["ExpressionAttributeNames"] = {"#day": "day"}
+
+        items = []
+        while True:
+            response = self.dynamodb.query(**kwargs)
+            items.extend(response.get("Items", []))
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+        def number(item, name):
+            return float(item[name]["N"]) if name in item else 0.0
+
+        stats = FolderStats()
+        stats.days = np.array([int(item["day"]["N"]) for item in items], dtype=np.int32)
+        stats.totals = np.array([[number(item, "images"), number(item, "faces")] for item in items],
+                                dtype=np.int64).reshape(-1, 2)
+        stats.dominant = np.array([[number(item, f"dominant_{e}") for e in EMOTIONS] for item in items],
+                                  dtype=np.int64).reshape(-1, len(EMOTIONS))
+        stats.confidence_sum = np.array([[number(item, f"confidence_{e}") for e in EMOTIONS] for item in items],
+                                        dtype=np.float64).reshape(-1, len(EMOTIONS))
+        stats.histogram = np.array(
+            [[[number(item, f"histogram_{e}_{b}") for b in range(HISTOGRAM_BINS)] for e in EMOTIONS] for item in items],
+            dtype=np.int64,
+        ).reshape(-1, len(EMOTIONS), HISTOGRAM_BINS)
+        return stats
+
+    def summary(self, folder: str, start: Optional[date] = None, end: Optional[date] = None,
+                granularity: str = "day") -> dict:
+        """Mesmas métricas de `EmotionStats.summary`, lidas da tabela."""
+        stats = self._load(folder.strip("/"), _day_to_int(start) if start else None, _day_to_int(end) if end else None)
+        return _summarize_folder(folder, stats, start, end, granularity)
+
+
+_emotion_stats = None
+_emotion_stats_lock = threading.Lock()
+
+
+def get_emotion_stats():
+    """Retorna as estatísticas do container: DynamoDB se `STATS_TABLE` estiver definida, senão arquivos locais."""
+    global _emotion_stats
+    if _emotion_stats is None:
+        with _emotion_stats_lock:
+            if _emotion_stats is None:
+                _emotion_stats = DynamoDBEmotionStats(STATS_TABLE) if STATS_TABLE else EmotionStats()
+    return _emotion_stats
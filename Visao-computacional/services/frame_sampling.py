@@ -0,0 +1,264 @@
+"""
+Amostragem de quadros de GIFs animados e vídeos curtos para análise no Rekognition.
+
+Os quadros são decodificados localmente e só os que mudam visualmente em relação ao último
+quadro escolhido são analisados (detecção de mudança de cena sobre miniaturas em tons de
+cinza, com as diferenças calculadas em NumPy). Assim o custo acompanha a variação visual
+do clipe, não a sua duração.
+
+Os quadros são decodificados um a um: só as miniaturas e os quadros candidatos ficam na
+memória, não o clipe inteiro.
+
+GIFs usam o Pillow. Vídeos exigem uma dependência opcional, não incluída no pacote do Lambda;
+sem ela, vídeos são recusados (`UnsupportedMediaError`, 415) antes do download:
+
+    pip install imageio[pyav]      # ou: pip install opencv-python-headless
+"""
+import io
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+try:
+    import imageio.v3 as iio
+except ImportError:  # pragma: no cover - dependência opcional
+    iio = None
+
+try:
+    import cv2
+except ImportError:  # pragma: no cover - dependência opcional
+    cv2 = None
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+GIF_EXTENSIONS = {".gif"}
+VIDEO_EXTENSIONS = {".mp4", ".mov", ".m4v", ".webm", ".avi"}
+
+# Tamanho máximo do arquivo multi-quadro baixado do S3 (conferido pelo ContentLength antes do download)
+MULTIFRAME_MAX_BYTES = int(os.getenv("MULTIFRAME_MAX_BYTES", str(50 * 1024 * 1024)))
+# Limite de quadros decodificados (GIFs longos ou vídeos)
+MAX_DECODED_FRAMES = int(os.getenv("MAX_DECODED_FRAMES", "600"))
+# Quadros por segundo considerados nos vídeos (os demais nem são convertidos)
+VIDEO_SAMPLE_FPS = float(os.getenv("VIDEO_SAMPLE_FPS", "4"))
+# Diferença média (0 a 1) em relação ao último quadro escolhido que caracteriza uma mudança de cena
+SCENE_CHANGE_THRESHOLD = float(os.getenv("SCENE_CHANGE_THRESHOLD", "0.08"))
+# Máximo de quadros enviados ao Rekognition por arquivo
+MAX_ANALYZED_FRAMES = int(os.getenv("MAX_ANALYZED_FRAMES", "8"))
+# Maior lado do quadro enviado ao Rekognition
+FRAME_MAX_SIDE = 1920
+THUMBNAIL_SIZE = 32
+
+# Quadro escolhido: (índice, instante em segundos, quadro RGB)
+Keyframe = Tuple[int, float, Image.Image]
+
+
+def get_extension(image_name: str) -> str:
+    return os.path.splitext(image_name)[1].lower()
+
+
+def is_multiframe(image_name: str) -> bool:
+    """Indica se o arquivo é um GIF ou vídeo, analisado quadro a quadro."""
+    return get_extension(image_name) in GIF_EXTENSIONS | VIDEO_EXTENSIONS
+
+
+class UnsupportedMediaError(ValueError):
+    """Formato sem análise de quadros disponível (extensão desconhecida ou vídeo sem decodificador)."""
+
+
+def check_decoder(image_name: str):
+    """
+    Confere, antes de baixar o arquivo, se há decodificador para o formato.
+
+    Raises:
+        UnsupportedMediaError: Se o formato não for suportado ou não houver decodificador de vídeo.
+    """
+    extension = get_extension(image_name)
+    if extension in GIF_EXTENSIONS:
+        return
+    if extension not in VIDEO_EXTENSIONS:
+        raise UnsupportedMediaError(f"Formato não suportado para análise de quadros: {extension}")
+    if iio is None and cv2 is None:
+        raise UnsupportedMediaError("Análise de vídeos indisponível neste ambiente; envie um GIF ou uma imagem.")
+
+
+def _decode_gif(data: bytes) -> Iterator[Tuple[float, Image.Image]]:
+    timestamp_ms = 0.0
+    with Image.open(io.BytesIO(data)) as image:
+        for index, frame in enumerate(ImageSequence.Iterator(image)):
+            if index >= MAX_DECODED_FRAMES:
+                break
+            yield timestamp_ms / 1000, frame.convert("RGB")
+            timestamp_ms += frame.info.get("duration") or 100  # GIFs sem duração: 10 quadros/s
+
+
+def _decode_video_imageio(data: bytes, extension: str) -> Iterator[Tuple[float, Image.Image]]:
+    fps = iio.immeta(data, extension=extension).get("fps") or 30.0
+    step = max(1, round(fps / VIDEO_SAMPLE_FPS))
+    for index, frame in enumerate(iio.imiter(data, extension=extension)):
+        if index % step:
+            continue
+        if index // step >= MAX_DECODED_FRAMES:
+            break
+        yield index / fps, Image.fromarray(frame).convert("RGB")
+
+
+def _decode_video_cv2(data: bytes, extension: str) -> Iterator[Tuple[float, Image.Image]]:
+    # O OpenCV só lê vídeos de arquivos
+    with tempfile.NamedTemporaryFile(suffix=extension) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        capture = cv2.VideoCapture(tmp.name)
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+            step = max(1, round(fps / VIDEO_SAMPLE_FPS))
+            index = 0
+            while index // step < MAX_DECODED_FRAMES and capture.grab():
+                if index % step == 0:
+                    ok, frame = capture.retrieve()
+                    if ok:
+                        yield index / fps, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                index += 1
+        finally:
+            capture.release()
+
+
+def decode_frames(data: bytes, image_name: str) -> Iterator[Tuple[float, Image.Image]]:
+    """
+    Decodifica os quadros de um GIF ou vídeo sob demanda, um por vez.
+
+    Returns:
+        iterator: Pares (instante em segundos, quadro RGB).
+
+    Raises:
+        UnsupportedMediaError: Se o formato não for suportado ou não houver decodificador de vídeo.
+    """
+    check_decoder(image_name)
+    extension = get_extension(image_name)
+    if extension in GIF_EXTENSIONS:
+        return _decode_gif(data)
+    if iio is not None:
+        return _decode_video_imageio(data, extension)
+    return _decode_video_cv2(data, extension)
+
+
+def _thumbnail(frame: Image.Image) -> np.ndarray:
+    """Miniatura em tons de cinza usada na comparação entre quadros."""
+    return np.asarray(frame.convert("L").resize((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.BILINEAR), dtype=np.float32)
+
+
+def select_keyframes(frames: Iterable[Tuple[float, Image.Image]], threshold: float = SCENE_CHANGE_THRESHOLD,
+                     max_frames: int = MAX_ANALYZED_FRAMES) -> Tuple[int, List[Keyframe]]:
+    """
+    Escolhe os quadros representativos por detecção de mudança de cena, à medida que são decodificados.
+
+    Cada quadro é reduzido a uma miniatura em tons de cinza e comparado com a miniatura do
+    último quadro escolhido (diferença absoluta média, de 0 a 1). Quando a diferença passa de
+    `threshold`, o quadro é escolhido e passa a ser a referência; assim mudanças graduais
+    também são captadas, mas o ruído entre quadros parecidos não se acumula. O primeiro
+    quadro sempre é escolhido; se houver mais que `max_frames`, ficam os de maior mudança
+    e, nos empates, os mais antigos.
+
+    Só a miniatura de referência e no máximo `max_frames + 1` quadros candidatos (reduzidos a
+    `FRAME_MAX_SIDE`) ficam na memória; os demais quadros são descartados logo após a comparação.
+
+    Returns:
+        tuple: (quadros decodificados, quadros escolhidos (índice, instante, quadro) em ordem temporal).
+
+    Raises:
+        ValueError: Se nenhum quadro puder ser decodificado.
+    """
+    reference = None
+    candidates = []  # (mudança, índice, instante, quadro)
+    decoded = 0
+    for index, (timestamp, frame) in enumerate(frames):
+        decoded += 1
+        thumbnail = _thumbnail(frame)
+        if reference is None:
+            score = np.inf
+        else:
+            score = float(np.abs(thumbnail - reference).mean()) / 255
+            if score < threshold:
+                continue
+
+        reference = thumbnail
+        frame.thumbnail((FRAME_MAX_SIDE, FRAME_MAX_SIDE))
+        candidates.append((score, index, timestamp, frame))
+        if len(candidates) > max_frames:
+            # Descarta a menor mudança; no empate, o candidato mais recente
+            candidates.remove(min(candidates, key=lambda candidate: (candidate[0], -candidate[1])))
+
+    if not decoded:
+        raise ValueError("Nenhum quadro pôde ser decodificado.")
+    return decoded, [(index, timestamp, frame) for _, index, timestamp, frame in candidates]
+
+
+def encode_frame(frame: Image.Image) -> bytes:
+    """Codifica o quadro em JPEG, reduzido para o limite de Bytes do Rekognition."""
+    if max(frame.size) > FRAME_MAX_SIDE:
+        frame = frame.copy()
+        frame.thumbnail((FRAME_MAX_SIDE, FRAME_MAX_SIDE))
+    buffer = io.BytesIO()
+    frame.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def analyze_frames(keyframes: List[Keyframe], analyze: Callable[[bytes], dict],
+                   max_workers: int = MAX_ANALYZED_FRAMES) -> List[dict]:
+    """
+    Executa `analyze(bytes_do_quadro)` nos quadros escolhidos, em paralelo.
+
+    Returns:
+        list: {"index", "timestamp", **resultado} por quadro, em ordem temporal.
+    """
+
+    def _run(keyframe):
+        index, timestamp, frame = keyframe
+        return {"index": index, "timestamp": round(timestamp, 3), **analyze(encode_frame(frame))}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keyframes)))) as executor:
+        return list(executor.map(_run, keyframes))
+
+
+def aggregate_emotions(frame_results: List[dict]) -> Dict[str, object]:
+    """
+    Agrega as emoções classificadas das faces ao longo dos quadros.
+
+    Returns:
+        dict: Emoção predominante e, por emoção, o número de faces e a confiança média.
+    """
+    counts = {}
+    confidence_sums = {}
+    for result in frame_results:
+        for face in result.get("faces", []):
+            emotion = face["classified_emotion"]
+            counts[emotion] = counts.get(emotion, 0) + 1
+            confidence_sums[emotion] = confidence_sums.get(emotion, 0.0) + face["classified_emotion_confidence"]
+
+    emotions = {
+        emotion: {"faces": count, "average_confidence": round(confidence_sums[emotion] / count, 2)}
+        for emotion, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)
+    }
+    return {"dominant_emotion": next(iter(emotions), None), "emotions": emotions}
+
+
+def aggregate_labels(frame_results: List[dict]) -> List[dict]:
+    """
+    Agrega os rótulos ao longo dos quadros no formato do Rekognition (`Name`, `Confidence`, `Categories`).
+
+    A confiança é a maior entre os quadros; `Frames` conta em quantos quadros o rótulo apareceu.
+    Os rótulos mais frequentes vêm primeiro.
+    """
+    labels = {}
+    for result in frame_results:
+        for label in result.get("labels", []):
+            current = labels.setdefault(label["Name"], {**label, "Frames": 0})
+            current["Frames"] += 1
+            current["Confidence"] = max(current["Confidence"], label["Confidence"])
+    return sorted(labels.values(), key=lambda label: (label["Frames"], label["Confidence"]), reverse=True)
@@ -1,25 +1,116 @@
-import boto3
+import threading
 from botocore.exceptions import ClientError
-from typing import Dict, Any, Union
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
 import os
 
+from services.credentials import get_client
+from services.image_header import parse_image_header
+
 # Carrega o nome da pasta a partir do arquivo .env
 FOLDER_NAME = os.getenv("FOLDER_NAME", "myphotos")  # Substitua "myphotos" pelo valor padrão desejado
 
-def get_image_details(bucket_name: str, image_name: str) -> Union[Dict[str, Any], Dict[str, str]]:
+# Bytes lidos do início do objeto para identificar formato e dimensões
+HEADER_READ_BYTES = int(os.getenv("HEADER_READ_BYTES", "16384"))
+# Leitura maior, usada só quando o cabeçalho não coube na primeira (ex.: JPEG com miniatura EXIF grande)
+HEADER_MAX_READ_BYTES = int(os.getenv("HEADER_MAX_READ_BYTES", "262144"))
+
+# Cache dos metadados por ETag (o conteúdo do objeto não muda enquanto o ETag for o mesmo)
+_metadata_cache = OrderedDict()
+_metadata_cache_lock = threading.Lock()
+METADATA_CACHE_SIZE = 4096
+
+def build_image_key(image_name: str) -> str:
+    """Constrói o caminho da imagem com base na pasta."""
+    return f"{FOLDER_NAME}/{image_name}"
+
+def format_image_details(bucket_name: str, image_key: str, head_response: dict) -> Dict[str, Any]:
+    """Monta a URL da imagem e a data de criação a partir da resposta do head_object."""
+    # Constrói a URL para acessar a imagem diretamente do S3
+    url_to_image = f"https://{bucket_name}.s3.amazonaws.com/{image_key}"
+    formatted_creation_date = head_response["LastModified"].strftime("%d-%m-%Y %H:%M:%S")
+
+    return {
+        "url_to_image": url_to_image,
+        "created_image": formatted_creation_date
+    }
+
+def get_cached_metadata(etag: str) -> Optional[Dict[str, Any]]:
+    """Retorna os metadados em cache para o ETag, se houver."""
+    with _metadata_cache_lock:
+        metadata = _metadata_cache.get(etag)
+        if metadata is not None:
+            _metadata_cache.move_to_end(etag)
+        return metadata
+
+def cache_metadata(etag: str, metadata: Dict[str, Any]):
+    """Guarda os metadados do ETag, descartando os mais antigos."""
+    with _metadata_cache_lock:
+        _metadata_cache[etag] = metadata
+        _metadata_cache.move_to_end(etag)
+        while len(_metadata_cache) > METADATA_CACHE_SIZE:
+            _metadata_cache.popitem(last=False)
+
+def read_image_metadata(s3_client, bucket_name: str, image_key: str, head_response: dict) -> Dict[str, Any]:
+    """
+    Lê formato e dimensões da imagem com um GET parcial (Range) do início do objeto.
+
+    Args:
+        s3_client: Cliente S3 do boto3.
+        bucket_name (str): O nome do bucket S3.
+        image_key (str): O caminho da imagem no bucket.
+        head_response (dict): Resposta do head_object (ETag e ContentLength).
+
+    Returns:
+        dict: format, width e height (None quando o formato não é reconhecido).
+    """
+    etag = head_response.get("ETag")
+    if etag:
+        cached = get_cached_metadata(etag)
+        if cached is not None:
+            return cached
+
+    content_length = head_response.get("ContentLength", 0)
+    metadata = None
+    read_bytes = HEADER_READ_BYTES
+    while metadata is None:
+        request = {"Bucket": bucket_name, "Key": image_key, "Range": f"bytes=0-{read_bytes - 1}"}
+        if etag:
+            request["IfMatch"] = etag
+        data = s3_client.get_object(**request)["Body"].read()
+        metadata = parse_image_header(data)
+        if len(data) >= content_length or read_bytes >= HEADER_MAX_READ_BYTES:
+            break
+        read_bytes = HEADER_MAX_READ_BYTES
+
+    metadata = metadata or {"format": None, "width": None, "height": None}
+    if etag:
+        cache_metadata(etag, metadata)
+    return metadata
+
+def format_face_emotions(response: dict) -> Dict[str, Any]:
+    """Extrai as emoções da primeira face da resposta do detect_faces."""
+    if response['FaceDetails']:
+        emotions = response['FaceDetails'][0]['Emotions']
+        return {"Emotions": emotions}
+    return {"error": "Nenhuma face detectada na imagem"}
+
+def get_image_details(bucket_name: str, image_name: str, include_metadata: bool = False) -> Union[Dict[str, Any], Dict[str, str]]:
     """
     Obtém os detalhes de uma imagem armazenada no S3.
 
     Args:
         bucket_name (str): O nome do bucket S3.
         image_name (str): A chave (nome) do arquivo de imagem no bucket S3.
+        include_metadata (bool): Se True, inclui formato, largura, altura e tamanho,
+                                 lidos de poucos KB do início do objeto.
 
     Returns:
         dict: Um dicionário contendo a URL da imagem e sua data de criação,
               ou uma mensagem de erro caso a operação falhe.
     """
-    s3_client = boto3.client("s3")
-    image_key = f"{FOLDER_NAME}/{image_name}"  # Constrói o caminho da imagem com base na pasta
+    s3_client = get_client("s3")
+    image_key = build_image_key(image_name)
 
     try:
         response = s3_client.head_object(Bucket=bucket_name, Key=image_key)
@@ -29,14 +120,18 @@ def get_image_details(bucket_name: str, image_name: str) -> Union[Dict[str, Any]
             "message": str(e)
         }
 
-    # Constrói a URL para acessar a imagem diretamente do S3
-    url_to_image = f"https://{bucket_name}.s3.amazonaws.com/{image_key}"
-    formatted_creation_date = response["LastModified"].strftime("%d-%m-%Y %H:%M:%S")
+    details = format_image_details(bucket_name, image_key, response)
+    if include_metadata:
+        try:
+            details.update(read_image_metadata(s3_client, bucket_name, image_key, response))
+        except ClientError as e:
+            return {
+                "error": "Erro ao ler o cabeçalho da imagem do S3",
+                "message": str(e)
+            }
+        details["size_bytes"] = response.get("ContentLength")
 
-    return {
-        "url_to_image": url_to_image,
-        "created_image": formatted_creation_date
-    }
+    return details
 
 def detect_face_emotions(bucket_name: str, image_name: str) -> Union[Dict[str, Any], Dict[str, str]]:
     """
@@ -49,20 +144,44 @@ def detect_face_emotions(bucket_name: str, image_name: str) -> Union[Dict[str, A
     Returns:
         dict: Dados das emoções detectadas ou mensagem de erro.
     """
-    rekognition = boto3.client('rekognition')
-    image_key = f"{FOLDER_NAME}/{image_name}"  # Constrói o caminho da imagem com base na pasta
+    rekognition = get_client('rekognition')
+    image_key = build_image_key(image_name)
 
     try:
         response = rekognition.detect_faces(
             Image={'S3Object': {'Bucket': bucket_name, 'Name': image_key}},
             Attributes=['ALL']
         )
-
-        if response['FaceDetails']:
-            emotions = response['FaceDetails'][0]['Emotions']
-            return {"Emotions": emotions}
-        else:
-            return {"error": "Nenhuma face detectada na imagem"}
-
     except ClientError as e:
         return {"error": "Erro ao detectar emoções faciais", "message": str(e)}
+
+    return format_face_emotions(response)
+
+class ImageTooLargeError(ValueError):
+    """O objeto excede o tamanho máximo aceito para download."""
+
+
+def get_image_bytes(bucket_name: str, image_key: str, max_bytes: Optional[int] = None) -> bytes:
+    """
+    Baixa o conteúdo de uma imagem armazenada no S3.
+
+    Args:
+        bucket_name (str): O nome do bucket S3.
+        image_key (str): O caminho completo da imagem no bucket.
+        max_bytes (int): Tamanho máximo; conferido pelo ContentLength antes de ler o corpo.
+
+    Returns:
+        bytes: O conteúdo do arquivo.
+
+    Raises:
+        ClientError: Se o objeto não puder ser lido.
+        ImageTooLargeError: Se o objeto tiver mais que `max_bytes` (o corpo não é baixado).
+    """
+    s3_client = get_client("s3")
+    response = s3_client.get_object(Bucket=bucket_name, Key=image_key)
+    if max_bytes is not None and response.get("ContentLength", 0) > max_bytes:
+        response["Body"].close()
+        raise ImageTooLargeError(
+            f"O arquivo excede o limite de {max_bytes / (1024 * 1024):g} MB ({response['ContentLength']} bytes)."
+        )
+    return response["Body"].read()
@@ -0,0 +1,332 @@
+"""
+Chaves de idempotência para requisições que os clientes repetem após timeouts de rede.
+
+O cliente envia o cabeçalho `Idempotency-Key`. A primeira requisição com a chave é processada
+e a resposta concluída fica guardada por `IDEMPOTENCY_TTL` segundos. As repetições com a mesma
+chave e o mesmo corpo recebem a resposta guardada, sem chamar o Rekognition ou o Bedrock de novo.
+Uma repetição que chega enquanto a primeira ainda está em andamento espera por ela. A mesma
+chave com outro corpo é rejeitada.
+
+O armazenamento é plugável:
+    - `InMemoryIdempotencyStore`: por processo (servidor local, testes).
+    - `DynamoDBIdempotencyStore`: tabela compartilhada entre containers (produção), usada
+      quando `IDEMPOTENCY_TABLE` está definida.
+"""
+import functools
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from services.credentials import get_client
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+IDEMPOTENCY_TABLE = os.getenv("IDEMPOTENCY_TABLE")
+# Por quanto tempo a resposta concluída é devolvida às repetições
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+# Validade da reserva em andamento (se o container morrer, outra requisição assume após esse tempo)
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+# Espera máxima de uma repetição pela requisição original
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "25"))
+MAX_KEY_LENGTH = 255
+
+STATUS_IN_PROGRESS = "IN_PROGRESS"
+STATUS_COMPLETED = "COMPLETED"
+
+
+class InMemoryIdempotencyStore:
+    """Registros de idempotência na memória do processo."""
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, body_hash: str, lock_seconds: int) -> Tuple[bool, Optional[dict]]:
+        """
+        Reserva a chave para processamento.
+
+        Returns:
+            tuple: (True, None) se a reserva foi feita, ou (False, registro existente).
+        """
+        now = time.time()
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or _is_expired(record, now):
+                self._records[key] = {
+                    "status": STATUS_IN_PROGRESS,
+                    "body_hash": body_hash,
+                    "expires_at": now + lock_seconds,
+                }
+                return True, None
+            return False, dict(record)
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None or _is_expired(record, time.time()):
+                return None
+            return dict(record)
+
+    def complete(self, key: str, response: dict, ttl: int):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None:
+                record.update({"status": STATUS_COMPLETED, "response": response, "expires_at": time.time() + ttl})
+
+    def release(self, key: str):
+        with self._lock:
+            record = self._records.get(key)
+            if record is not None and record["status"] == STATUS_IN_PROGRESS:
+                del self._records[key]
+
+
+class DynamoDBIdempotencyStore:
+    """
+    Registros de idempotência em uma tabela DynamoDB compartilhada.
+
+    Chave de partição `idempotency_key` (string) e TTL da tabela no atributo `expires_at`.
+    A reserva é um PutItem condicional, de modo que só um container processa cada chave.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.dynamodb = get_client("dynamodb")
+
+    def acquire(self, key: str, body_hash: str, lock_seconds: int) -> Tuple[bool, Optional[dict]]:
+        now = int(time.time())
+        try:
+            self.dynamodb.put_item(
+                TableName=self.table_name,
+                Item={
+                    "idempotency_key": {"S": key},
+                    "status": {"S": STATUS_IN_PROGRESS},
+                    "body_hash": {"S": body_hash},
+                    "expires_at": {"N": str(now + lock_seconds)},
+                },
+                # O TTL do DynamoDB remove itens com atraso: itens vencidos também podem ser substituídos
+                ConditionExpression="attribute_not_exists(idempotency_key) OR expires_at < :now",
+                ExpressionAttributeValues={":now": {"N": str(now)}},
+            )
+            return True, None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+        return False, self.get(key)
+
+    def get(self, key: str) -> Optional[dict]:
+        response = self.dynamodb.get_item(
+            TableName=self.table_name, Key={"idempotency_key": {"S": key}}, ConsistentRead=True
+        )
+        item = response.get("Item")
+        # Mesmo critério de expiração do `acquire` (segundos inteiros): um registro que a condição
+        # do PutItem ainda considera válido não pode ser dado como expirado aqui
+        if item is None or int(item["expires_at"]["N"]) < int(time.time()):
+            return None
+        record = {
+            "status": item["status"]["S"],
+            "body_hash": item["body_hash"]["S"],
+            "expires_at": int(item["expires_at"]["N"]),
+        }
+        if "response" in item:
+            record["response"] = json.loads(item["response"]["S"])
+        return record
+
+    def complete(self, key: str, response: dict, ttl: int):
+        self.dynamodb.update_item(
+            TableName=self.table_name,
+            Key={"idempotency_key": {"S": key}},
+            UpdateExpression="SET #status = :completed, #response = :response, expires_at = :expires_at",
+            ExpressionAttributeNames={"#status": "status", "#response": "response"},
+            ExpressionAttributeValues={
+                ":completed": {"S": STATUS_COMPLETED},
+                ":response": {"S": json.dumps(response)},
+                ":expires_at": {"N": str(int(time.time()) + ttl)},
+            },
+        )
+
+    def release(self, key: str):
+        try:
+            self.dynamodb.delete_item(
+                TableName=self.table_name,
+                Key={"idempotency_key": {"S": key}},
+                ConditionExpression="#status = :in_progress",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":in_progress": {"S": STATUS_IN_PROGRESS}},
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") != "ConditionalCheckFailedException":
+                raise
+
+
+def _is_expired(record: dict, now: float) -> bool:
+    return record["expires_at"] < now
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    """Retorna o armazenamento do container: DynamoDB se `IDEMPOTENCY_TABLE` estiver definida, senão memória."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DynamoDBIdempotencyStore(IDEMPOTENCY_TABLE) if IDEMPOTENCY_TABLE else InMemoryIdempotencyStore()
+        return _store
+
+
+def get_idempotency_key(event: dict) -> Optional[str]:
+    """Lê o cabeçalho `Idempotency-Key` (sem diferenciar maiúsculas e minúsculas)."""
+    for name, value in (event.get("headers") or {}).items():
+        if name.lower() == IDEMPOTENCY_HEADER:
+            return value.strip() if isinstance(value, str) else None
+    return None
+
+
+def hash_body(body) -> str:
+    """Hash do corpo da requisição; JSON equivalente (ordem das chaves, espaços) gera o mesmo hash."""
+    body = body or ""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except (TypeError, ValueError):
+        pass  # Corpo não é JSON: usa o texto original
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+def _error_response(status_code: int, message: str, headers: Optional[dict] = None) -> dict:
+    response = {"statusCode": status_code, "body": json.dumps({"message": message})}
+    if headers:
+        response["headers"] = headers
+    return response
+
+
+def _replay(response: dict) -> dict:
+    """Resposta guardada, marcada como repetição."""
+    return {**response, "headers": {**(response.get("headers") or {}), "Idempotent-Replayed": "true"}}
+
+
+def _should_store(response: dict) -> bool:
+    """
+    Só respostas definitivas são guardadas: status < 500 (exceto 429) e não degradadas.
+
+    Uma resposta degradada (só faces, sob sobrecarga) seria devolvida às repetições pelo TTL
+    inteiro; sem guardá-la, a repetição tem a chance de receber a análise completa.
+    """
+    status_code = response.get("statusCode", 500)
+    if status_code >= 500 or status_code == 429:
+        return False
+    try:
+        data = json.loads(response.get("body") or "{}").get("data")
+    except (TypeError, ValueError):
+        return True
+    return not (isinstance(data, dict) and data.get("degraded"))
+
+
+def _wait_timeout(context) -> float:
+    """Espera máxima pela requisição original, limitada ao tempo restante da invocação."""
+    timeout = IDEMPOTENCY_WAIT_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        timeout = min(timeout, context.get_remaining_time_in_millis() / 1000 - 1)
+    return max(timeout, 0)
+
+
+def _wait_for_completion(store, key: str, timeout: float) -> Optional[dict]:
+    """Consulta o registro até ele ser concluído, liberado ou o tempo acabar."""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+        record = store.get(key)
+        if record is None or record["status"] == STATUS_COMPLETED:
+            return record
+        delay = min(delay * 2, 1.0)
+    return store.get(key)
+
+
+def _release_quietly(store, key: str):
+    """Libera a reserva sem mascarar a exceção original (a reserva expira sozinha se falhar)."""
+    try:
+        store.release(key)
+    except (BotoCoreError, ClientError) as e:
+        logger.warning("Falha ao liberar a reserva de %s: %s", key, e)
+
+
+def idempotent(func: Callable) -> Callable:
+    """
+    Decorador para rotas `(event, context)` que aceitam o cabeçalho `Idempotency-Key`.
+
+    Sem o cabeçalho, a rota é executada normalmente. Só respostas definitivas são guardadas
+    (ver `_should_store`): após um erro do servidor, uma rejeição por sobrecarga ou uma resposta
+    degradada, a repetição volta a processar a requisição. Se o armazenamento falhar, a
+    requisição é processada sem idempotência em vez de falhar.
+    """
+
+    @functools.wraps(func)
+    def wrapper(event, context):
+        key = get_idempotency_key(event)
+        if key is None:
+            return func(event, context)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error_response(400, f"O cabeçalho 'Idempotency-Key' deve ter entre 1 e {MAX_KEY_LENGTH} caracteres.")
+
+        store = get_idempotency_store()
+        # A chave vale por rota: a mesma chave em /v1/vision e /v2/vision são requisições diferentes
+        record_key = f"{event.get('path', '')}#{key}"
+        body_hash = hash_body(event.get("body"))
+
+        while True:
+            try:
+                acquired, record = store.acquire(record_key, body_hash, IDEMPOTENCY_LOCK_SECONDS)
+            except (BotoCoreError, ClientError) as e:
+                # Sem o armazenamento (erro da API, timeout ou falha de conexão), processa normalmente
+                logger.warning("Armazenamento de idempotência indisponível: %s", e)
+                return func(event, context)
+            if acquired:
+                break
+            if record is None:
+                continue  # O registro expirou ou foi liberado entre as chamadas: tenta reservar de novo
+            if record["body_hash"] != body_hash:
+                logger.warning("Idempotency-Key %s reutilizada com outro corpo.", key)
+                return _error_response(422, "A 'Idempotency-Key' já foi usada com outro corpo de requisição.")
+            if record["status"] == STATUS_COMPLETED:
+                logger.info("Idempotency-Key %s: devolvendo a resposta guardada.", key)
+                return _replay(record["response"])
+
+            logger.info("Idempotency-Key %s em andamento; aguardando a requisição original.", key)
+            try:
+                record = _wait_for_completion(store, record_key, _wait_timeout(context))
+            except (BotoCoreError, ClientError) as e:
+                logger.warning("Armazenamento de idempotência indisponível durante a espera: %s", e)
+                record = {"status": STATUS_IN_PROGRESS}  # A original segue em andamento: pede nova tentativa
+            if record is not None and record["status"] == STATUS_COMPLETED:
+                return _replay(record["response"])
+            if record is not None:
+                return _error_response(409, "Requisição com a mesma 'Idempotency-Key' ainda em andamento.",
+                                       {"Retry-After": "1"})
+            # A requisição original falhou e liberou a chave: esta assume o processamento
+
+        try:
+            response = func(event, context)
+        except Exception:
+            _release_quietly(store, record_key)
+            raise
+
+        try:
+            if _should_store(response):
+                store.complete(record_key, response, IDEMPOTENCY_TTL)
+            else:
+                store.release(record_key)
+        except (BotoCoreError, ClientError) as e:
+            logger.warning("Falha ao registrar a resposta da Idempotency-Key %s: %s", key, e)
+        return response
+
+    return wrapper
@@ -0,0 +1,273 @@
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from services.credentials import get_client
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Distância de Hamming máxima (em bits, de 64) para considerar duas imagens quase idênticas
+DEDUP_MAX_DISTANCE = int(os.getenv("DEDUP_MAX_DISTANCE", "6"))
+# Tabela DynamoDB compartilhada entre containers; sem ela, o índice fica em um SQLite local
+DEDUP_TABLE = os.getenv("DEDUP_TABLE")
+DEDUP_INDEX_PATH = os.getenv("DEDUP_INDEX_PATH", "/tmp/dedup_index.db")
+HASH_BITS = 64
+
+
+def compute_dhash(image_bytes: bytes, hash_size: int = 8) -> int:
+    """
+    Calcula o dHash (difference hash) de uma imagem.
+
+    A imagem é convertida para tons de cinza e reduzida para (hash_size + 1) x hash_size;
+    cada bit indica se um pixel é mais claro que o vizinho da direita. O hash resiste a
+    redimensionamento, recompressão e pequenos ajustes de cor.
+
+    Args:
+        image_bytes (bytes): Conteúdo do arquivo de imagem.
+        hash_size (int): Lado da grade de comparação (8 gera um hash de 64 bits).
+
+    Returns:
+        int: Hash perceptual com hash_size * hash_size bits.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))  # Decodificação reduzida de JPEG
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Número de bits diferentes entre dois hashes."""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+def chunk_bounds(max_distance: int = DEDUP_MAX_DISTANCE, hash_bits: int = HASH_BITS) -> List[Tuple[int, int]]:
+    """
+    Divide o hash em `max_distance + 1` faixas de bits contíguas, o mais iguais possível.
+
+    Returns:
+        list: Pares (deslocamento, largura) de cada faixa, do bit menos significativo ao mais significativo.
+    """
+    count = max_distance + 1
+    base, extra = divmod(hash_bits, count)
+    bounds = []
+    shift = 0
+    for index in range(count):
+        width = base + (1 if index < extra else 0)
+        bounds.append((shift, width))
+        shift += width
+    return bounds
+
+
+def chunk_keys(image_hash: int, bounds: List[Tuple[int, int]]) -> List[str]:
+    """Chaves `"<faixa>:<valor>"` das faixas do hash, usadas como termos do índice."""
+    return [f"{index}:{(image_hash >> shift) & ((1 << width) - 1):x}" for index, (shift, width) in enumerate(bounds)]
+
+
+class SQLiteHashStore:
+    """
+    Faixas e análises em um arquivo SQLite local (servidor local, testes).
+
+    O arquivo só é aberto na primeira consulta e as análises ficam no disco: nada é
+    carregado na memória do processo.
+    """
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS chunks (
+        chunk TEXT NOT NULL,
+        image_key TEXT NOT NULL,
+        hash TEXT NOT NULL,
+        PRIMARY KEY (chunk, image_key)
+    ) WITHOUT ROWID;
+    CREATE TABLE IF NOT EXISTS analyses (
+        image_key TEXT PRIMARY KEY,
+        hash TEXT NOT NULL,
+        analysis TEXT NOT NULL
+    );
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            self._conn.executescript(self._SCHEMA)
+        return self._conn
+
+    def candidates(self, keys: List[str]) -> Dict[str, int]:
+        """Imagens que compartilham ao menos uma faixa com o hash: {image_key: hash}."""
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT image_key, hash FROM chunks WHERE chunk IN ({placeholders})", keys
+            ).fetchall()
+        return {image_key: int(image_hash, 16) for image_key, image_hash in rows}
+
+    def get_analysis(self, image_key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT analysis FROM analyses WHERE image_key = ?", (image_key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, image_key: str, image_hash: int, keys: List[str], analysis: Dict[str, Any]):
+        hex_hash = f"{image_hash:016x}"
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM chunks WHERE image_key = ?", (image_key,))
+                conn.executemany(
+                    "INSERT INTO chunks (chunk, image_key, hash) VALUES (?, ?, ?)",
+                    [(key, image_key, hex_hash) for key in keys],
+                )
+                conn.execute(
+                    "INSERT OR REPLACE INTO analyses (image_key, hash, analysis) VALUES (?, ?, ?)",
+                    (image_key, hex_hash, json.dumps(analysis, ensure_ascii=True)),
+                )
+
+
+class DynamoDBHashStore:
+    """
+    Faixas e análises em uma tabela DynamoDB compartilhada entre containers (produção).
+
+    Chave de partição `pk` e de ordenação `sk` (strings):
+        - `chunk#<faixa>:<valor>` / `<image_key>`: uma entrada por faixa, com o hash completo em `hash`;
+        - `image#<image_key>` / `analysis`: a análise (JSON), lida só para a imagem escolhida, e
+          as faixas gravadas (`chunks`), para removê-las quando a imagem é indexada de novo.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.dynamodb = get_client("dynamodb")
+
+    def _query_chunk(self, key: str) -> Dict[str, int]:
+        found = {}
+        kwargs = {
+            "TableName": self.table_name,
+            "KeyConditionExpression": "pk = :pk",
+            "ExpressionAttributeValues": {":pk": {"S": f"chunk#{key}"}},
+            "ProjectionExpression": "sk, #hash",
+            "ExpressionAttributeNames": {"#hash": "hash"},
+        }
+        while True:
+            response = self.dynamodb.query(**kwargs)
+            for item in response.get("Items", []):
+                found[item["sk"]["S"]] = int(item["hash"]["S"], 16)
+            if "LastEvaluatedKey" not in response:
+                return found
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def candidates(self, keys: List[str]) -> Dict[str, int]:
+        # As faixas são partições independentes: consultadas em paralelo
+        found = {}
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            for result in executor.map(self._query_chunk, keys):
+                found.update(result)
+        return found
+
+    def get_analysis(self, image_key: str) -> Optional[Dict[str, Any]]:
+        response = self.dynamodb.get_item(
+            TableName=self.table_name,
+            Key={"pk": {"S": f"image#{image_key}"}, "sk": {"S": "analysis"}},
+        )
+        item = response.get("Item")
+        return json.loads(item["analysis"]["S"]) if item else None
+
+    def _batch_write(self, requests: List[dict]):
+        while requests:
+            response = self.dynamodb.batch_write_item(RequestItems={self.table_name: requests})
+            requests = response.get("UnprocessedItems", {}).get(self.table_name, [])
+
+    def put(self, image_key: str, image_hash: int, keys: List[str], analysis: Dict[str, Any]):
+        hex_hash = f"{image_hash:016x}"
+        analysis_key = {"pk": {"S": f"image#{image_key}"}, "sk": {"S": "analysis"}}
+
+        # Conteúdo novo na mesma chave: remove antes as faixas do hash antigo, como no SQLite,
+        # para que elas não levem à análise nova a partir de outra imagem
+        previous = self.dynamodb.get_item(
+            TableName=self.table_name, Key=analysis_key, ProjectionExpression="chunks"
+        ).get("Item")
+        previous_keys = previous["chunks"]["SS"] if previous and "chunks" in previous else []
+        self._batch_write([
+            {"DeleteRequest": {"Key": {"pk": {"S": f"chunk#{key}"}, "sk": {"S": image_key}}}}
+            for key in previous_keys if key not in keys
+        ])
+
+        # A análise é gravada antes das faixas: quem encontra a faixa sempre encontra a análise
+        self.dynamodb.put_item(
+            TableName=self.table_name,
+            Item={
+                **analysis_key,
+                "hash": {"S": hex_hash},
+                "chunks": {"SS": list(keys)},
+                "analysis": {"S": json.dumps(analysis, ensure_ascii=True)},
+            },
+        )
+        self._batch_write([
+            {"PutRequest": {"Item": {"pk": {"S": f"chunk#{key}"}, "sk": {"S": image_key}, "hash": {"S": hex_hash}}}}
+            for key in keys
+        ])
+
+
+class DuplicateIndex:
+    """
+    Índice de imagens já analisadas, consultado por similaridade perceptual (multi-index hashing).
+
+    O hash de 64 bits é dividido em `max_distance + 1` faixas. Pelo princípio da casa dos
+    pombos, dois hashes a até `max_distance` bits de distância coincidem em pelo menos uma
+    faixa; basta buscar as imagens com alguma faixa igual e conferir a distância exata só
+    nelas. Cada consulta custa `max_distance + 1` leituras por chave, sem percorrer o índice.
+    """
+
+    def __init__(self, store, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.store = store
+        self.max_distance = max_distance
+        self._bounds = chunk_bounds(max_distance)
+
+    def find(self, image_hash: int) -> Optional[Dict[str, Any]]:
+        """Retorna a entrada mais próxima dentro do limite de distância, se houver."""
+        candidates = self.store.candidates(chunk_keys(image_hash, self._bounds))
+        matches = sorted(
+            (hamming_distance(image_hash, candidate_hash), image_key)
+            for image_key, candidate_hash in candidates.items()
+        )
+        for distance, image_key in matches:
+            if distance > self.max_distance:
+                break
+            analysis = self.store.get_analysis(image_key)
+            if analysis is not None:
+                return {"image_key": image_key, "analysis": analysis, "distance": distance}
+        return None
+
+    def add(self, image_hash: int, image_key: str, analysis: Dict[str, Any]):
+        """Registra a análise de uma imagem no índice."""
+        self.store.put(image_key, image_hash, chunk_keys(image_hash, self._bounds), analysis)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_duplicate_index() -> DuplicateIndex:
+    """Retorna o índice do container: DynamoDB se `DEDUP_TABLE` estiver definida, senão SQLite local."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            store = DynamoDBHashStore(DEDUP_TABLE) if DEDUP_TABLE else SQLiteHashStore(DEDUP_INDEX_PATH)
+            _index = DuplicateIndex(store)
+        return _index
@@ -0,0 +1,98 @@
+import struct
+from typing import Dict, Optional
+
+# Marcadores SOF do JPEG que carregam as dimensões (exclui DHT, JPG e DAC)
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+_HEIF_BRANDS = {b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx", b"mif1", b"msf1", b"avif"}
+
+
+def _parse_jpeg(data: bytes) -> Optional[Dict[str, object]]:
+    offset = 2
+    while offset + 9 <= len(data):
+        if data[offset] != 0xFF:
+            return None
+        marker = data[offset + 1]
+        if marker == 0xFF:  # Bytes de preenchimento
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # Marcadores sem tamanho
+            offset += 2
+            continue
+        segment_length = struct.unpack(">H", data[offset + 2:offset + 4])[0]
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[offset + 5:offset + 9])
+            return {"format": "jpeg", "width": width, "height": height}
+        offset += 2 + segment_length
+    return None
+
+
+def _parse_png(data: bytes) -> Optional[Dict[str, object]]:
+    if len(data) < 24 or data[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", data[16:24])
+    return {"format": "png", "width": width, "height": height}
+
+
+def _parse_gif(data: bytes) -> Optional[Dict[str, object]]:
+    if len(data) < 10:
+        return None
+    width, height = struct.unpack("<HH", data[6:10])
+    return {"format": "gif", "width": width, "height": height}
+
+
+def _parse_webp(data: bytes) -> Optional[Dict[str, object]]:
+    if len(data) < 30:
+        return None
+    chunk = data[12:16]
+    if chunk == b"VP8 ":
+        width, height = struct.unpack("<HH", data[26:30])
+        return {"format": "webp", "width": width & 0x3FFF, "height": height & 0x3FFF}
+    if chunk == b"VP8L":
+        bits = struct.unpack("<I", data[21:25])[0]
+        return {"format": "webp", "width": (bits & 0x3FFF) + 1, "height": ((bits >> 14) & 0x3FFF) + 1}
+    if chunk == b"VP8X":
+        width = int.from_bytes(data[24:27], "little") + 1
+        height = int.from_bytes(data[27:30], "little") + 1
+        return {"format": "webp", "width": width, "height": height}
+    return None
+
+
+def _parse_heif(data: bytes) -> Optional[Dict[str, object]]:
+    # As dimensões ficam em caixas 'ispe' (meta/iprp/ipco); a maior corresponde à imagem principal
+    best = None
+    position = data.find(b"ispe")
+    while position != -1 and position + 16 <= len(data):
+        width, height = struct.unpack(">II", data[position + 8:position + 16])
+        if best is None or width * height > best[0] * best[1]:
+            best = (width, height)
+        position = data.find(b"ispe", position + 4)
+    if best is None:
+        return None
+    image_format = "avif" if data[8:12] == b"avif" else "heic"
+    return {"format": image_format, "width": best[0], "height": best[1]}
+
+
+def parse_image_header(data: bytes) -> Optional[Dict[str, object]]:
+    """
+    Identifica formato e dimensões a partir dos primeiros bytes de uma imagem.
+
+    Suporta JPEG (segmento SOF), PNG (IHDR), GIF, WebP (VP8, VP8L e VP8X) e HEIC/AVIF (caixa ispe).
+
+    Args:
+        data (bytes): Início do arquivo (alguns KB costumam bastar).
+
+    Returns:
+        dict: format, width e height, ou None se o formato não for reconhecido ou
+              os bytes não forem suficientes.
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        return _parse_jpeg(data)
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return _parse_png(data)
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return _parse_gif(data)
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return _parse_webp(data)
+    if data[4:8] == b"ftyp" and data[8:12] in _HEIF_BRANDS:
+        return _parse_heif(data)
+    return None
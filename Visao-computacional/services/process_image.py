@@ -1,5 +1,4 @@
 import json
-import boto3
 from botocore.exceptions import ClientError
 from typing import Dict, Any, Union
 import os
@@ -9,14 +8,11 @@ HEALTH_MESSAGE = "Go Serverless v3.0! Your function executed successfully!"
 VERSION_1_MESSAGE = "VISION API version 1."
 VERSION_2_MESSAGE = "VISION API version 2."
 
-import boto3
+from services.credentials import get_client
 
-# Inicializa a sessão boto3 com a região apropriada
-session = boto3.Session(region_name='us-east-1')  # Ajuste a região conforme necessário
-
-# Cria clientes para Rekognition e Bedrock
-rekognition = session.client('rekognition')
-bedrock = session.client('bedrock-runtime')  # Certifique-se de que este serviço é suportado
+# Clientes compartilhados, com as credenciais renovadas antes de expirar
+rekognition = get_client('rekognition')
+bedrock = get_client('bedrock-runtime')  # Certifique-se de que este serviço é suportado
 
 # Variável de ambiente para o nome da pasta
 FOLDER_NAME = os.getenv("FOLDER_NAME", "default_folder")  # Substitua "default_folder" pelo valor padrão desejado
@@ -67,7 +63,6 @@ def detect_face_emotions(bucket_name: str, image_name: str) -> Union[Dict[str, A
     """
     Detecta emoções faciais em uma imagem armazenada no S3 usando o Amazon Rekognition.
     """
-    rekognition = boto3.client('rekognition')
     image_key = f"{FOLDER_NAME}/{image_name}"  # Constrói o caminho da imagem com base na pasta
     try:
         response = rekognition.detect_faces(
@@ -0,0 +1,212 @@
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from botocore.config import Config
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, ReadTimeoutError
+
+from services.credentials import get_credential_provider
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Regiões permitidas, em ordem de preferência (a primeira é a região principal)
+ALLOWED_REGIONS = [
+    region.strip()
+    for region in os.getenv("AWS_ALLOWED_REGIONS", os.getenv("AWS_REGION", "us-east-1")).split(",")
+    if region.strip()
+]
+
+# Endpoints alternativos por região, em JSON (ex.: serviços locais nos testes):
+# AWS_REGION_ENDPOINTS='{"us-east-1": "http://localhost:5001", "us-west-2": "http://localhost:5002"}'
+REGION_ENDPOINTS = json.loads(os.getenv("AWS_REGION_ENDPOINTS", "{}"))
+
+# Erros que indicam problema da região (e não da requisição): tentam a próxima região
+FAILOVER_ERROR_CODES = {
+    "ThrottlingException", "Throttling", "TooManyRequestsException", "ProvisionedThroughputExceededException",
+    "LimitExceededException", "ServiceUnavailableException", "ServiceUnavailable", "InternalServerError",
+    "InternalServerException", "ModelNotReadyException",
+}
+
+# Tempo mínimo (s) para ainda valer a pena tentar uma região dentro do prazo da requisição
+MIN_ATTEMPT_SECONDS = 1
+
+# O failover entre regiões substitui os retries do botocore: uma tentativa por região
+SINGLE_ATTEMPT_CONFIG = Config(retries={"total_max_attempts": 1})
+
+
+class RegionHealth:
+    """Médias móveis exponenciais (EWMA) de latência e taxa de erro de uma região/operação."""
+
+    def __init__(self):
+        self.latency_ms = None
+        self.error_rate = 0.0
+        self.updated_at = 0.0
+
+    def record(self, latency_ms: float, failed: bool, alpha: float):
+        self.error_rate = self.decayed_error_rate(0) * (1 - alpha) + (alpha if failed else 0.0)
+        if not failed:
+            self.latency_ms = latency_ms if self.latency_ms is None else self.latency_ms * (1 - alpha) + latency_ms * alpha
+        self.updated_at = time.monotonic()
+
+    def decayed_error_rate(self, half_life: float) -> float:
+        """Taxa de erro com decaimento no tempo, para que uma região volte a ser tentada após se recuperar."""
+        if not half_life or not self.updated_at:
+            return self.error_rate
+        return self.error_rate * 0.5 ** ((time.monotonic() - self.updated_at) / half_life)
+
+
+class RegionClientPool:
+    """
+    Clientes boto3 de um serviço em várias regiões, com roteamento pela região mais saudável.
+
+    Cada chamada vai para a região com menor custo estimado (latência EWMA penalizada pela
+    taxa de erro EWMA) e, em caso de throttling, indisponibilidade ou falha de conexão,
+    tenta automaticamente a próxima. Uma pequena fração das chamadas (`explore_rate`)
+    começa por outra região, para renovar as médias e detectar quando ela se recupera.
+
+    Só deve ser usado em chamadas que não dependem de recursos regionais
+    (ex.: Rekognition com `Bytes`, Bedrock), nunca com `S3Object`.
+
+    Os clientes fazem uma única tentativa por chamada (`SINGLE_ATTEMPT_CONFIG`), para que o
+    failover aconteça de imediato em vez de após os retries do botocore na mesma região.
+    """
+
+    def __init__(self, service: str, regions: Optional[List[str]] = None, endpoints: Optional[Dict[str, str]] = None,
+                 config: Optional[Config] = None, alpha: float = 0.2, error_penalty: float = 20.0,
+                 error_half_life: float = 30.0, prior_latency_ms: float = 500.0, explore_rate: float = 0.02):
+        self.service = service
+        self.regions = regions or ALLOWED_REGIONS
+        self.endpoints = REGION_ENDPOINTS if endpoints is None else endpoints
+        self.config = SINGLE_ATTEMPT_CONFIG.merge(config) if config is not None else SINGLE_ATTEMPT_CONFIG
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.error_half_life = error_half_life
+        self.prior_latency_ms = prior_latency_ms
+        self.explore_rate = explore_rate
+
+        self._clients = {}
+        self._health: Dict[tuple, RegionHealth] = {}
+        self._lock = threading.Lock()
+
+    def client(self, region: str, read_timeout: int = None):
+        """
+        Retorna o cliente da região, criando-o na primeira chamada.
+
+        Com `read_timeout` (segundos inteiros), usa um cliente com esse timeout de leitura,
+        para que a chamada não ultrapasse o prazo restante da requisição.
+        """
+        key = (region, read_timeout)
+        with self._lock:
+            if key not in self._clients:
+                config = self.config
+                if read_timeout is not None:
+                    config = config.merge(Config(read_timeout=read_timeout))
+                self._clients[key] = get_credential_provider().client(
+                    self.service, region_name=region, endpoint_url=self.endpoints.get(region), config=config
+                )
+            return self._clients[key]
+
+    def _attempt_timeout(self, deadline: float):
+        """Timeout de leitura da próxima tentativa: o restante do prazo, limitado ao da configuração."""
+        remaining = deadline - time.monotonic()
+        if remaining < MIN_ATTEMPT_SECONDS:
+            return None
+        configured = self.config.read_timeout or math.inf
+        return int(min(remaining, configured))
+
+    def _score(self, region: str, operation: str, order: int) -> tuple:
+        health = self._health.get((region, operation))
+        if health is None:
+            latency, error_rate = self.prior_latency_ms, 0.0
+        else:
+            latency = health.latency_ms if health.latency_ms is not None else self.prior_latency_ms
+            error_rate = health.decayed_error_rate(self.error_half_life)
+        return latency * (1 + self.error_penalty * error_rate), order
+
+    def ranked_regions(self, operation: str) -> List[str]:
+        """Regiões permitidas, da mais saudável para a menos saudável, para a operação."""
+        with self._lock:
+            scores = {region: self._score(region, operation, order) for order, region in enumerate(self.regions)}
+        ranked = sorted(self.regions, key=scores.get)
+        if len(ranked) > 1 and random.random() < self.explore_rate:
+            ranked.insert(0, ranked.pop(random.randrange(1, len(ranked))))
+        return ranked
+
+    def _record(self, region: str, operation: str, latency_ms: float, failed: bool):
+        with self._lock:
+            self._health.setdefault((region, operation), RegionHealth()).record(latency_ms, failed, self.alpha)
+
+    def call(self, operation: str, deadline: float = None, **kwargs):
+        """
+        Executa a operação na região mais saudável, com failover para as demais.
+
+        Args:
+            operation (str): Nome do método do cliente boto3.
+            deadline (float): Instante (`time.monotonic()`) limite; cada tentativa usa no máximo
+                o tempo restante e não há failover depois dele.
+
+        Raises:
+            ClientError: Erro da requisição (não regional) ou da última região tentada.
+            TimeoutError: Se o prazo acabar antes da primeira tentativa.
+        """
+        last_error = None
+        for region in self.ranked_regions(operation):
+            read_timeout = None
+            if deadline is not None:
+                read_timeout = self._attempt_timeout(deadline)
+                if read_timeout is None:
+                    break
+            start = time.monotonic()
+            try:
+                result = getattr(self.client(region, read_timeout), operation)(**kwargs)
+            except ClientError as e:
+                latency_ms = (time.monotonic() - start) * 1000
+                code = e.response.get("Error", {}).get("Code", "")
+                status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode", 0)
+                if code not in FAILOVER_ERROR_CODES and status < 500:
+                    self._record(region, operation, latency_ms, failed=False)
+                    raise
+                self._record(region, operation, latency_ms, failed=True)
+                logger.warning("%s.%s falhou em %s (%s); tentando outra região.", self.service, operation, region, code)
+                last_error = e
+            except (BotoConnectionError, ReadTimeoutError) as e:
+                self._record(region, operation, (time.monotonic() - start) * 1000, failed=True)
+                logger.warning("%s.%s sem conexão com %s (%s); tentando outra região.", self.service, operation, region, e)
+                last_error = e
+            else:
+                self._record(region, operation, (time.monotonic() - start) * 1000, failed=False)
+                return result
+
+        if last_error is None:
+            raise TimeoutError(f"Prazo esgotado antes de chamar {self.service}.{operation}.")
+        raise last_error
+
+    def health_snapshot(self) -> Dict[str, dict]:
+        """Latência e taxa de erro atuais por região e operação (para logs e health checks)."""
+        with self._lock:
+            return {
+                f"{region}:{operation}": {
+                    "latency_ms": None if health.latency_ms is None else round(health.latency_ms, 2),
+                    "error_rate": round(health.decayed_error_rate(self.error_half_life), 4),
+                }
+                for (region, operation), health in self._health.items()
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_region_pool(service: str, config: Optional[Config] = None) -> RegionClientPool:
+    """Retorna o pool compartilhado do serviço no container, criando-o na primeira chamada."""
+    with _pools_lock:
+        if service not in _pools:
+            _pools[service] = RegionClientPool(service, config=config)
+        return _pools[service]
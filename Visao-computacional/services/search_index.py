@@ -0,0 +1,238 @@
+import logging
+import os
+import sqlite3
+import threading
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from services.credentials import get_client
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tabela DynamoDB compartilhada pelas rotas que indexam e pela busca (produção)
+SEARCH_TABLE = os.getenv("SEARCH_TABLE")
+# Índice SQLite usado sem SEARCH_TABLE (servidor local, testes). No Lambda, o /tmp é de cada
+# container, e o modo WAL do SQLite não funciona em volumes de rede como o EFS.
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "/tmp/search_index.db")
+
+KIND_EMOTION = "emotion"
+KIND_LABEL = "label"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL,
+    term TEXT NOT NULL COLLATE NOCASE,
+    image_key TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    PRIMARY KEY (kind, term, image_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_postings_folder ON postings (kind, term, folder, confidence DESC);
+CREATE INDEX IF NOT EXISTS idx_postings_image ON postings (image_key, kind);
+"""
+
+
+class SearchIndex:
+    """
+    Índice invertido em SQLite: emoção ou rótulo -> imagens, com a confiança de cada ocorrência.
+
+    Cada imagem aparece uma vez por termo, com a maior confiança observada (por exemplo,
+    duas faces HAPPY na mesma imagem geram uma única entrada).
+    """
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def _replace(self, kind: str, image_key: str, terms: Iterable[Tuple[str, float]]):
+        """Substitui as entradas de uma imagem para o tipo de termo informado."""
+        best = _best_terms(kind, terms)
+        folder = _folder_of(image_key)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings WHERE image_key = ? AND kind = ?", (image_key, kind))
+            self._conn.executemany(
+                "INSERT INTO postings (kind, term, image_key, folder, confidence) VALUES (?, ?, ?, ?, ?)",
+                [(kind, term, image_key, folder, float(confidence)) for term, confidence in best.items()],
+            )
+
+    def index_emotions(self, image_key: str, emotions: Iterable[Tuple[str, float]]):
+        """Indexa as emoções (tipo, confiança) classificadas nas faces da imagem."""
+        self._replace(KIND_EMOTION, image_key, emotions)
+
+    def index_labels(self, image_key: str, labels: List[dict]):
+        """Indexa os rótulos retornados pelo detect_labels do Rekognition."""
+        self._replace(KIND_LABEL, image_key, ((label.get("Name"), label.get("Confidence", 0.0)) for label in labels))
+
+    def search(self, kind: str, term: str, folder: Optional[str] = None,
+               min_confidence: float = 0.0, limit: int = 100) -> List[dict]:
+        """
+        Busca as imagens associadas a uma emoção ou rótulo.
+
+        Args:
+            kind (str): "emotion" ou "label".
+            term (str): Emoção (ex.: HAPPY) ou rótulo (ex.: Border Collie), sem diferenciar maiúsculas.
+            folder (str): Restringe a busca a uma pasta do bucket.
+            min_confidence (float): Confiança mínima.
+            limit (int): Número máximo de resultados.
+
+        Returns:
+            list: Dicionários com image_key e confidence, do mais confiável ao menos confiável.
+        """
+        query = "SELECT image_key, confidence FROM postings WHERE kind = ? AND term = ? AND confidence >= ?"
+        params = [kind, term, min_confidence]
+        if folder is not None:
+            query += " AND folder = ?"
+            params.append(folder.strip("/"))
+        query += " ORDER BY confidence DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [{"image_key": image_key, "confidence": confidence} for image_key, confidence in rows]
+
+    def close(self):
+        self._conn.close()
+
+
+class DynamoDBSearchIndex:
+    """
+    Índice invertido em uma tabela DynamoDB, compartilhado entre as funções que indexam e a busca.
+
+    Chave de partição `pk` e de ordenação `sk` (strings):
+        - `<tipo>#<termo em minúsculas>` / `<image_key>`: uma entrada por imagem e termo, com
+          `folder` e `confidence`; o índice local `by_confidence` as ordena por confiança;
+        - `<tipo>#<termo em minúsculas>#<pasta>` / `<image_key>`: a mesma entrada repetida na
+          partição da pasta, para que a busca por pasta leia só as imagens dela;
+        - `image#<image_key>` / `<tipo>`: os termos indexados da imagem, para remover os
+          que deixam de valer quando a imagem é indexada de novo.
+    """
+
+    BY_CONFIDENCE = "by_confidence"
+    BATCH_SIZE = 25  # Limite do BatchWriteItem
+
+    def __init__(self, table_name: str = SEARCH_TABLE):
+        self.table_name = table_name
+        self.dynamodb = get_client("dynamodb")
+
+    @staticmethod
+    def _posting_pk(kind: str, term: str, folder: Optional[str] = None) -> str:
+        pk = f"{kind}#{term.lower()}"
+        return pk if folder is None else f"{pk}#{folder}"
+
+    def _batch_write(self, requests: List[dict]):
+        for start in range(0, len(requests), self.BATCH_SIZE):
+            pending = requests[start:start + self.BATCH_SIZE]
+            while pending:
+                response = self.dynamodb.batch_write_item(RequestItems={self.table_name: pending})
+                pending = response.get("UnprocessedItems", {}).get(self.table_name, [])
+
+    def _replace(self, kind: str, image_key: str, terms: Iterable[Tuple[str, float]]):
+        # Termos sem diferenciar maiúsculas, como o COLLATE NOCASE do SQLite
+        best = {}
+        for term, confidence in _best_terms(kind, terms).items():
+            best[term.lower()] = max(confidence, best.get(term.lower(), 0.0))
+        folder = _folder_of(image_key)
+        image_item_key = {"pk": {"S": f"image#{image_key}"}, "sk": {"S": kind}}
+
+        previous = self.dynamodb.get_item(TableName=self.table_name, Key=image_item_key).get("Item")
+        previous_terms = previous["terms"]["SS"] if previous and "terms" in previous else []
+        stale = [term for term in previous_terms if term not in best]
+
+        # Cada termo vai para a partição global e para a da pasta (a pasta vem da própria image_key)
+        requests = [
+            {"PutRequest": {"Item": {
+                "pk": {"S": pk},
+                "sk": {"S": image_key},
+                "folder": {"S": folder},
+                "confidence": {"N": str(Decimal(str(float(confidence))))},
+            }}}
+            for term, confidence in best.items()
+            for pk in (self._posting_pk(kind, term), self._posting_pk(kind, term, folder))
+        ]
+        requests += [
+            {"DeleteRequest": {"Key": {"pk": {"S": pk}, "sk": {"S": image_key}}}}
+            for term in stale
+            for pk in (self._posting_pk(kind, term), self._posting_pk(kind, term, folder))
+        ]
+        self._batch_write(requests)
+
+        if best:
+            self.dynamodb.put_item(TableName=self.table_name, Item={**image_item_key, "terms": {"SS": sorted(best)}})
+        elif previous:
+            self.dynamodb.delete_item(TableName=self.table_name, Key=image_item_key)
+
+    def index_emotions(self, image_key: str, emotions: Iterable[Tuple[str, float]]):
+        """Indexa as emoções (tipo, confiança) classificadas nas faces da imagem."""
+        self._replace(KIND_EMOTION, image_key, emotions)
+
+    def index_labels(self, image_key: str, labels: List[dict]):
+        """Indexa os rótulos retornados pelo detect_labels do Rekognition."""
+        self._replace(KIND_LABEL, image_key, ((label.get("Name"), label.get("Confidence", 0.0)) for label in labels))
+
+    def search(self, kind: str, term: str, folder: Optional[str] = None,
+               min_confidence: float = 0.0, limit: int = 100) -> List[dict]:
+        """
+        Mesma busca de `SearchIndex.search`, pelo índice `by_confidence` em ordem decrescente.
+
+        Com `folder`, consulta a partição da pasta: só as imagens dela são lidas.
+        """
+        kwargs = {
+            "TableName": self.table_name,
+            "IndexName": self.BY_CONFIDENCE,
+            "KeyConditionExpression": "pk = :pk AND confidence >= :min_confidence",
+            "ExpressionAttributeValues": {
+                ":pk": {"S": self._posting_pk(kind, term, None if folder is None else folder.strip("/"))},
+                ":min_confidence": {"N": str(Decimal(str(float(min_confidence))))},
+            },
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+
+        results = []
+        while len(results) < limit:
+            response = self.dynamodb.query(**kwargs)
+            results.extend(
+                {"image_key": item["sk"]["S"], "confidence": float(item["confidence"]["N"])}
+                for item in response.get("Items", [])
+            )
+            if "LastEvaluatedKey" not in response:
+                break
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        return results[:limit]
+
+
+def _best_terms(kind: str, terms: Iterable[Tuple[str, float]]) -> Dict[str, float]:
+    """Maior confiança por termo (emoções em maiúsculas), ignorando termos vazios."""
+    best = {}
+    for term, confidence in terms:
+        if term:
+            key = term.upper() if kind == KIND_EMOTION else term
+            best[key] = max(confidence, best.get(key, 0.0))
+    return best
+
+
+def _folder_of(image_key: str) -> str:
+    return image_key.rsplit("/", 1)[0] if "/" in image_key else ""
+
+
+_search_index = None
+_search_index_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Retorna o índice do container, criado na primeira chamada: DynamoDB se `SEARCH_TABLE`
+    estiver definida, senão o SQLite local.
+    """
+    global _search_index
+    if _search_index is None:
+        with _search_index_lock:
+            if _search_index is None:
+                _search_index = DynamoDBSearchIndex(SEARCH_TABLE) if SEARCH_TABLE else SearchIndex()
+    return _search_index
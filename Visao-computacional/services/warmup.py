@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, Optional
+
+from botocore.exceptions import ClientError
+
+from services.breed_tips import tips_cache
+from services.credentials import get_client, get_credential_provider
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BUCKET_NAME = os.getenv("BUCKET_NAME")
+
+# Raças cujas dicas são pré-carregadas no aquecimento (separadas por vírgula)
+WARMUP_BREEDS = [breed.strip() for breed in os.getenv("WARMUP_BREEDS", "").split(",") if breed.strip()]
+
+# Containers mantidos aquecidos por função: o evento agendado chega a um único container, que
+# invoca a própria função mais N - 1 vezes em paralelo (o evento pode sobrescrever com "concurrency")
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "1"))
+# Tempo que cada invocação derivada segura o container, para que as N invocações simultâneas
+# não sejam atendidas pelo mesmo container
+WARMUP_HOLD_MS = int(os.getenv("WARMUP_HOLD_MS", "1000"))
+FANOUT_MARKER = "warmup_fanout"
+
+# Estado do container (sobrevive entre invocações do mesmo container)
+_container_started_at = time.time()
+_state = {"warmed_at": None, "warmups": 0, "components": {}}
+_state_lock = threading.Lock()
+
+
+def is_warmup_event(event: dict) -> bool:
+    """
+    Indica se o evento é um aquecimento e não uma requisição real.
+
+    Aceita o evento agendado do serverless.yml (`{"warmup": true}`, também usado nas
+    invocações derivadas do fan-out), o do plugin
+    serverless-plugin-warmup e eventos "Scheduled Event" do EventBridge.
+    """
+    if not isinstance(event, dict):
+        return False
+    if event.get("warmup") is True:
+        return True
+    if event.get("source") == "serverless-plugin-warmup":
+        return True
+    return event.get("source") == "aws.events" and event.get("detail-type") == "Scheduled Event"
+
+
+def _open_connection(call: Callable):
+    """Executa uma chamada barata só para abrir a conexão TLS; erros de permissão não importam."""
+    try:
+        call()
+    except ClientError:
+        pass  # A resposta (mesmo 403/404) já passou pela conexão, que fica no pool
+
+
+def _warm_credentials():
+    get_credential_provider().get_frozen_credentials()
+
+
+def _warm_s3():
+    s3_client = get_client("s3")
+    _open_connection(lambda: s3_client.head_bucket(Bucket=BUCKET_NAME or "warmup"))
+
+
+def _warm_rekognition():
+    rekognition = get_client("rekognition")
+    _open_connection(lambda: rekognition.list_collections(MaxResults=1))
+
+
+def _warm_rekognition_regions():
+    from services.region_pool import get_region_pool
+
+    pool = get_region_pool("rekognition")
+    for region in pool.regions:
+        client = pool.client(region)
+        _open_connection(lambda: client.list_collections(MaxResults=1))
+
+
+def _warm_bedrock():
+    from services.bedrock_runtime import bedrock_pool
+
+    # O Bedrock Runtime não tem chamada de leitura barata: apenas constrói os clientes
+    for region in bedrock_pool.regions:
+        bedrock_pool.client(region)
+
+
+def _warm_search_index():
+    from services.search_index import get_search_index
+
+    get_search_index()
+
+
+def _warm_emotion_stats():
+    from services.emotion_stats import get_emotion_stats
+
+    get_emotion_stats()
+
+
+WARMUP_STEPS: Dict[str, Callable] = {
+    "credentials": _warm_credentials,
+    "s3": _warm_s3,
+    "rekognition": _warm_rekognition,
+    "rekognition_regions": _warm_rekognition_regions,
+    "bedrock": _warm_bedrock,
+    "search_index": _warm_search_index,
+    "emotion_stats": _warm_emotion_stats,
+}
+
+
+def fan_out(event: dict) -> Optional[dict]:
+    """
+    Invoca a própria função `concurrency - 1` vezes em paralelo, cada invocação em outro container.
+
+    Só o evento agendado dispara o fan-out; as invocações derivadas levam `FANOUT_MARKER` e não
+    o repetem. Elas são síncronas e seguram o container por `WARMUP_HOLD_MS`, de modo que,
+    enquanto todas estão em andamento, o Lambda precisa de um container para cada uma.
+
+    Returns:
+        dict: Invocações pedidas e concluídas, ou None se não houve fan-out.
+    """
+    concurrency = int(event.get("concurrency", WARMUP_CONCURRENCY))
+    function_name = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+    if event.get(FANOUT_MARKER) or event.get("source") == "serverless-plugin-warmup":
+        return None  # Invocação derivada, ou o plugin já cuida da concorrência
+    if concurrency <= 1 or not function_name:
+        return None
+
+    lambda_client = get_client("lambda")
+    payload = json.dumps({"warmup": True, FANOUT_MARKER: True}).encode("utf-8")
+
+    def _invoke(_):
+        try:
+            response = lambda_client.invoke(FunctionName=function_name, InvocationType="RequestResponse", Payload=payload)
+            return "FunctionError" not in response
+        except Exception as e:
+            logger.warning("Falha ao invocar o aquecimento derivado de %s: %s", function_name, e)
+            return False
+
+    with ThreadPoolExecutor(max_workers=concurrency - 1) as executor:
+        succeeded = sum(executor.map(_invoke, range(concurrency - 1)))
+    logger.info("Fan-out do aquecimento: %d de %d invocações concluídas.", succeeded, concurrency - 1)
+    return {"requested": concurrency - 1, "succeeded": succeeded}
+
+
+def warm_up(components: Iterable[str], extra_steps: Optional[Dict[str, Callable]] = None,
+            event: Optional[dict] = None) -> dict:
+    """
+    Inicializa clientes, conexões e caches do container, em paralelo.
+
+    Args:
+        components (Iterable[str]): Nomes de WARMUP_STEPS a executar (as credenciais sempre são aquecidas).
+        extra_steps (dict): Passos específicos do handler (ex.: pré-carregar dicas de raças).
+        event (dict): Evento de aquecimento; o agendado dispara o fan-out (ver `fan_out`).
+
+    Returns:
+        dict: Estado de aquecimento do container (ver `warm_status`), com o resultado do fan-out.
+    """
+    event = event or {}
+    start = time.monotonic()
+    fan_out_executor = ThreadPoolExecutor(max_workers=1)
+    fan_out_future = fan_out_executor.submit(fan_out, event)
+
+    steps = {"credentials": WARMUP_STEPS["credentials"]}
+    steps.update({name: WARMUP_STEPS[name] for name in components})
+    steps.update(extra_steps or {})
+
+    def _run(name):
+        start = time.monotonic()
+        try:
+            steps[name]()
+            status = "ok"
+        except Exception as e:
+            logger.warning("Falha ao aquecer %s: %s", name, e)
+            status = f"erro: {e}"
+        return name, {"status": status, "ms": round((time.monotonic() - start) * 1000, 2)}
+
+    # As credenciais vêm antes, para que os demais passos não as resolvam em paralelo
+    results = dict([_run("credentials")])
+    with ThreadPoolExecutor(max_workers=max(1, len(steps) - 1)) as executor:
+        results.update(executor.map(_run, [name for name in steps if name != "credentials"]))
+
+    with _state_lock:
+        _state["components"].update(results)
+        _state["warmed_at"] = datetime.now(timezone.utc).isoformat()
+        _state["warmups"] += 1
+
+    logger.info("Container aquecido: %s", results)
+
+    fanout = fan_out_future.result()
+    fan_out_executor.shutdown()
+    if event.get(FANOUT_MARKER):
+        # Segura o container enquanto as invocações irmãs ainda estão chegando
+        time.sleep(max(0.0, WARMUP_HOLD_MS / 1000 - (time.monotonic() - start)))
+
+    status = warm_status()
+    if fanout is not None:
+        status["fanout"] = fanout
+    return status
+
+
+def warm_status() -> dict:
+    """Quão aquecido está o container: idade, aquecimentos, componentes prontos e caches carregados."""
+    with _state_lock:
+        components = dict(_state["components"])
+        return {
+            "warm": bool(components) and all(item["status"] == "ok" for item in components.values()),
+            "container_age_s": round(time.time() - _container_started_at, 1),
+            "warmed_at": _state["warmed_at"],
+            "warmups": _state["warmups"],
+            "components": components,
+            "cached_breed_tips": len(tips_cache),
+        }
+
+
+def warmup_response(status: dict) -> dict:
+    """Resposta do evento de aquecimento (não passa pelo processamento real)."""
+    return {
+        "statusCode": 200,
+        "body": json.dumps({"message": "Container aquecido", "data": status}, ensure_ascii=True)
+    }
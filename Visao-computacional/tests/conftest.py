@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Permite importar `services` e `handlers` como nos handlers do Lambda
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,247 @@
+import json
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+from services import idempotency
+from services.idempotency import DynamoDBIdempotencyStore, STATUS_COMPLETED, STATUS_IN_PROGRESS, idempotent
+
+TABLE = "idempotency"
+NOW = 1_700_000_000
+BODY = json.dumps({"bucket": "b", "imageName": "cao.jpg"})
+RECORD_KEY = "/v2/vision#chave-1"
+OK = {"statusCode": 200, "body": json.dumps({"message": "ok", "data": {"faces": []}})}
+
+
+@pytest.fixture
+def store(monkeypatch):
+    client = boto3.client("dynamodb", region_name="us-east-1", aws_access_key_id="teste", aws_secret_access_key="teste")
+    monkeypatch.setattr(idempotency, "get_client", lambda service: client)
+    monkeypatch.setattr(idempotency.time, "time", lambda: NOW + 0.7)
+    monkeypatch.setattr(idempotency.time, "sleep", lambda seconds: None)
+    store = DynamoDBIdempotencyStore(TABLE)
+    monkeypatch.setattr(idempotency, "_store", store)
+    with Stubber(client) as stubber:
+        yield store, stubber
+        stubber.assert_no_pending_responses()
+
+
+def item(status: str, expires_at: int, body: str = BODY, response: dict = None) -> dict:
+    result = {
+        "idempotency_key": {"S": RECORD_KEY},
+        "status": {"S": status},
+        "body_hash": {"S": idempotency.hash_body(body)},
+        "expires_at": {"N": str(expires_at)},
+    }
+    if response is not None:
+        result["response"] = {"S": json.dumps(response)}
+    return result
+
+
+def expect_acquire(stubber, acquired: bool):
+    params = {
+        "TableName": TABLE,
+        "Item": {
+            "idempotency_key": {"S": RECORD_KEY},
+            "status": {"S": STATUS_IN_PROGRESS},
+            "body_hash": {"S": idempotency.hash_body(BODY)},
+            "expires_at": {"N": str(NOW + idempotency.IDEMPOTENCY_LOCK_SECONDS)},
+        },
+        "ConditionExpression": "attribute_not_exists(idempotency_key) OR expires_at < :now",
+        "ExpressionAttributeValues": {":now": {"N": str(NOW)}},
+    }
+    if acquired:
+        stubber.add_response("put_item", {}, params)
+    else:
+        stubber.add_client_error("put_item", "ConditionalCheckFailedException", expected_params=params)
+
+
+def expect_get(stubber, found: dict = None):
+    params = {"TableName": TABLE, "Key": {"idempotency_key": {"S": RECORD_KEY}}, "ConsistentRead": True}
+    stubber.add_response("get_item", {"Item": found} if found else {}, params)
+
+
+def expect_complete(stubber, response: dict):
+    stubber.add_response("update_item", {}, {
+        "TableName": TABLE,
+        "Key": {"idempotency_key": {"S": RECORD_KEY}},
+        "UpdateExpression": "SET #status = :completed, #response = :response, expires_at = :expires_at",
+        "ExpressionAttributeNames": {"#status": "status", "#response": "response"},
+        "ExpressionAttributeValues": {
+            ":completed": {"S": STATUS_COMPLETED},
+            ":response": {"S": json.dumps(response)},
+            ":expires_at": {"N": str(NOW + idempotency.IDEMPOTENCY_TTL)},
+        },
+    })
+
+
+def expect_release(stubber, error_code: str = None):
+    params = {
+        "TableName": TABLE,
+        "Key": {"idempotency_key": {"S": RECORD_KEY}},
+        "ConditionExpression": "#status = :in_progress",
+        "ExpressionAttributeNames": {"#status": "status"},
+        "ExpressionAttributeValues": {":in_progress": {"S": STATUS_IN_PROGRESS}},
+    }
+    if error_code:
+        stubber.add_client_error("delete_item", error_code, expected_params=params)
+    else:
+        stubber.add_response("delete_item", {}, params)
+
+
+def make_route(response: dict, calls: list):
+    @idempotent
+    def route(event, context):
+        calls.append(event)
+        return response
+
+    return route
+
+
+def event(key: str = "chave-1", body: str = BODY) -> dict:
+    return {"path": "/v2/vision", "headers": {"Idempotency-Key": key}, "body": body}
+
+
+def test_acquire_reserves_new_key(store):
+    store, stubber = store
+    expect_acquire(stubber, acquired=True)
+    assert store.acquire(RECORD_KEY, idempotency.hash_body(BODY), idempotency.IDEMPOTENCY_LOCK_SECONDS) == (True, None)
+
+
+def test_acquire_returns_existing_record(store):
+    store, stubber = store
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_COMPLETED, NOW + 100, response=OK))
+    acquired, record = store.acquire(RECORD_KEY, idempotency.hash_body(BODY), idempotency.IDEMPOTENCY_LOCK_SECONDS)
+    assert not acquired
+    assert record["status"] == STATUS_COMPLETED
+    assert record["response"] == OK
+
+
+def test_get_uses_the_same_expiry_as_acquire(store):
+    store, stubber = store
+    # expires_at == int(now): a condição do PutItem (expires_at < :now) ainda o considera válido
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW))
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW - 1))
+    assert store.get(RECORD_KEY)["status"] == STATUS_IN_PROGRESS
+    assert store.get(RECORD_KEY) is None
+
+
+def test_release_ignores_completed_records(store):
+    store, stubber = store
+    expect_release(stubber, "ConditionalCheckFailedException")
+    store.release(RECORD_KEY)
+
+
+def test_release_raises_other_errors(store):
+    store, stubber = store
+    expect_release(stubber, "ProvisionedThroughputExceededException")
+    with pytest.raises(idempotency.ClientError):
+        store.release(RECORD_KEY)
+
+
+def test_first_request_is_processed_and_completed(store):
+    store, stubber = store
+    calls = []
+    expect_acquire(stubber, acquired=True)
+    expect_complete(stubber, OK)
+    assert make_route(OK, calls)(event(), None) == OK
+    assert len(calls) == 1
+
+
+def test_completed_request_is_replayed(store):
+    store, stubber = store
+    calls = []
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_COMPLETED, NOW + 100, response=OK))
+    response = make_route(OK, calls)(event(), None)
+    assert calls == []
+    assert response["body"] == OK["body"]
+    assert response["headers"]["Idempotent-Replayed"] == "true"
+
+
+def test_key_reused_with_another_body_is_rejected(store):
+    store, stubber = store
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW + 60, body="{}"))
+    assert make_route(OK, [])(event(), None)["statusCode"] == 422
+
+
+def test_retry_waits_for_the_original_request(store):
+    store, stubber = store
+    calls = []
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW + 60))
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW + 60))
+    expect_get(stubber, item(STATUS_COMPLETED, NOW + 100, response=OK))
+    response = make_route(OK, calls)(event(), None)
+    assert calls == []
+    assert response["headers"]["Idempotent-Replayed"] == "true"
+
+
+def test_retry_takes_over_when_the_original_releases(store):
+    store, stubber = store
+    calls = []
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW + 60))
+    expect_get(stubber)  # A original falhou e liberou a chave
+    expect_acquire(stubber, acquired=True)
+    expect_complete(stubber, OK)
+    assert make_route(OK, calls)(event(), None) == OK
+    assert len(calls) == 1
+
+
+def test_record_at_expiry_boundary_is_awaited_not_reacquired(store):
+    store, stubber = store
+    # PutItem recusado com expires_at == int(now); o GetItem deve devolver o registro em vez de
+    # None, senão o decorador repete PutItem/GetItem sem espera até o segundo seguinte
+    expect_acquire(stubber, acquired=False)
+    expect_get(stubber, item(STATUS_IN_PROGRESS, NOW))
+    expect_get(stubber, item(STATUS_COMPLETED, NOW + 100, response=OK))
+    assert make_route(OK, [])(event(), None)["headers"]["Idempotent-Replayed"] == "true"
+
+
+def test_server_errors_release_the_key(store):
+    store, stubber = store
+    error = {"statusCode": 500, "body": json.dumps({"message": "erro"})}
+    expect_acquire(stubber, acquired=True)
+    expect_release(stubber)
+    assert make_route(error, [])(event(), None) == error
+
+
+def test_degraded_responses_release_the_key(store):
+    store, stubber = store
+    degraded = {"statusCode": 200, "body": json.dumps({"message": "ok", "data": {"degraded": True}})}
+    expect_acquire(stubber, acquired=True)
+    expect_release(stubber)
+    assert make_route(degraded, [])(event(), None) == degraded
+
+
+def test_exceptions_release_the_key(store):
+    store, stubber = store
+
+    @idempotent
+    def route(event, context):
+        raise RuntimeError("falha")
+
+    expect_acquire(stubber, acquired=True)
+    expect_release(stubber)
+    with pytest.raises(RuntimeError):
+        route(event(), None)
+
+
+def test_unavailable_store_processes_the_request(store):
+    store, stubber = store
+    calls = []
+    expect_acquire(stubber, acquired=False)
+    stubber.add_client_error("get_item", "InternalServerError", http_status_code=500)
+    assert make_route(OK, calls)(event(), None) == OK
+    assert len(calls) == 1
+
+
+def test_requests_without_key_skip_the_store(store):
+    store, stubber = store
+    calls = []
+    assert make_route(OK, calls)({"path": "/v2/vision", "body": BODY}, None) == OK
+    assert len(calls) == 1
@@ -0,0 +1,130 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from services.region_pool import RegionClientPool
+
+REGIONS = ["us-east-1", "us-west-2", "eu-west-1"]
+
+
+def client_error(code: str, status: int) -> ClientError:
+    return ClientError(
+        {"Error": {"Code": code, "Message": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "DetectLabels",
+    )
+
+
+class StubClient:
+    """Cliente de uma região: devolve `result` ou levanta `error`, registrando as chamadas."""
+
+    def __init__(self, region: str, calls: list, error: Exception = None):
+        self.region = region
+        self.calls = calls
+        self.error = error
+
+    def detect_labels(self, **kwargs):
+        self.calls.append(self.region)
+        if self.error is not None:
+            raise self.error
+        return {"Region": self.region}
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+def make_pool(calls, errors=None, **kwargs):
+    pool = RegionClientPool("rekognition", regions=list(REGIONS), endpoints={}, explore_rate=0.0, **kwargs)
+    clients = {region: StubClient(region, calls, (errors or {}).get(region)) for region in REGIONS}
+    pool.client = lambda region, read_timeout=None: clients[region]
+    return pool
+
+
+def test_pool_clients_make_a_single_attempt():
+    pool = RegionClientPool("rekognition", regions=list(REGIONS), endpoints={})
+    assert pool.config.retries == {"total_max_attempts": 1}
+
+
+def test_ranked_regions_follow_configured_order_without_history(calls):
+    pool = make_pool(calls)
+    assert pool.ranked_regions("detect_labels") == REGIONS
+
+
+def test_ranked_regions_prefer_lower_latency(calls):
+    pool = make_pool(calls)
+    pool._record("us-east-1", "detect_labels", 900.0, failed=False)
+    pool._record("us-west-2", "detect_labels", 100.0, failed=False)
+    pool._record("eu-west-1", "detect_labels", 300.0, failed=False)
+    assert pool.ranked_regions("detect_labels") == ["us-west-2", "eu-west-1", "us-east-1"]
+
+
+def test_ranked_regions_penalize_errors(calls):
+    pool = make_pool(calls)
+    pool._record("us-east-1", "detect_labels", 100.0, failed=False)
+    pool._record("us-east-1", "detect_labels", 100.0, failed=True)
+    pool._record("us-west-2", "detect_labels", 400.0, failed=False)
+    assert pool.ranked_regions("detect_labels")[0] == "us-west-2"
+
+
+def test_health_is_tracked_per_operation(calls):
+    pool = make_pool(calls)
+    pool._record("us-east-1", "detect_faces", 100.0, failed=True)
+    assert pool.ranked_regions("detect_labels")[0] == "us-east-1"
+
+
+@pytest.mark.parametrize("error", [
+    client_error("ThrottlingException", 400),
+    client_error("ProvisionedThroughputExceededException", 400),
+    client_error("InternalServerError", 500),
+    client_error("UnknownServerFault", 503),
+    EndpointConnectionError(endpoint_url="https://rekognition.us-east-1.amazonaws.com"),
+])
+def test_call_fails_over_on_regional_errors(calls, error):
+    pool = make_pool(calls, errors={"us-east-1": error})
+    assert pool.call("detect_labels", Image={"Bytes": b"x"}) == {"Region": "us-west-2"}
+    assert calls == ["us-east-1", "us-west-2"]
+    assert pool.health_snapshot()["us-east-1:detect_labels"]["error_rate"] > 0
+
+
+@pytest.mark.parametrize("code", ["InvalidParameterException", "InvalidImageFormatException", "AccessDeniedException"])
+def test_call_does_not_fail_over_on_client_errors(calls, code):
+    pool = make_pool(calls, errors={"us-east-1": client_error(code, 400)})
+    with pytest.raises(ClientError) as excinfo:
+        pool.call("detect_labels", Image={"Bytes": b"x"})
+    assert excinfo.value.response["Error"]["Code"] == code
+    assert calls == ["us-east-1"]
+    # Erro da requisição não piora a saúde da região
+    assert pool.health_snapshot()["us-east-1:detect_labels"]["error_rate"] == 0
+
+
+def test_call_raises_last_error_when_all_regions_fail(calls):
+    errors = {region: client_error("ThrottlingException", 400) for region in REGIONS}
+    errors["eu-west-1"] = client_error("ServiceUnavailableException", 503)
+    pool = make_pool(calls, errors=errors)
+    with pytest.raises(ClientError) as excinfo:
+        pool.call("detect_labels", Image={"Bytes": b"x"})
+    assert excinfo.value.response["Error"]["Code"] == "ServiceUnavailableException"
+    assert calls == REGIONS
+
+
+def test_failed_region_is_demoted_for_next_calls(calls):
+    pool = make_pool(calls, errors={"us-east-1": client_error("ThrottlingException", 400)})
+    pool.call("detect_labels", Image={"Bytes": b"x"})
+    pool.call("detect_labels", Image={"Bytes": b"x"})
+    assert calls == ["us-east-1", "us-west-2", "us-west-2"]
+
+
+def test_call_raises_timeout_when_deadline_already_passed(calls):
+    pool = make_pool(calls)
+    with pytest.raises(TimeoutError):
+        pool.call("detect_labels", deadline=time.monotonic(), Image={"Bytes": b"x"})
+    assert calls == []
+
+
+def test_region_endpoints_are_used_for_each_region():
+    endpoints = {"us-east-1": "http://localhost:5001", "us-west-2": "http://localhost:5002"}
+    pool = RegionClientPool("rekognition", regions=["us-east-1", "us-west-2"], endpoints=endpoints)
+    assert pool.client("us-west-2").meta.endpoint_url == "http://localhost:5002"
+    assert pool.client("us-west-2").meta.config.retries["total_max_attempts"] == 1
@@ -1,14 +1,21 @@
 import os
+import sys
 from pathlib import Path
 import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError, EndpointConnectionError, ClientError
 
+# Adiciona o diretório do projeto ao sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.credentials import get_credential_provider
+
 class AWSConnectionManager:
     """Conexão com AWS utilizando boto3."""
 
     def __init__(self):
         self.credentials = None
         self.s3_client = None
+        self.sts_client = None
 
     @staticmethod
     def clean_terminal():
@@ -26,15 +33,10 @@ class AWSConnectionManager:
 
         if credentials_path.exists():
             try:
-                # O boto3 automaticamente carrega as credenciais do arquivo
-                session = boto3.Session()
-                credentials = session.get_credentials().get_frozen_credentials()
-
-                self.credentials = {
-                    'aws_access_key_id': credentials.access_key,
-                    'aws_secret_access_key': credentials.secret_key,
-                    'aws_session_token': credentials.token
-                }
+                # Resolve as credenciais pelo provedor compartilhado, que as renova antes de expirar;
+                # self.credentials fica vazio para que os clientes usem o provedor
+                get_credential_provider().get_frozen_credentials()
+                self.credentials = None
             except Exception as e:
                 print(f"Erro ao carregar credenciais do arquivo: {e}")
                 self.credentials = None
@@ -74,28 +76,30 @@ aws_session_token = {self.credentials['aws_session_token']}
             print(f"Erro ao salvar credenciais: {e}")
 
     def create_s3_client(self):
-        """Cria um cliente S3 usando as credenciais fornecidas ou as padrão."""
+        """Cria os clientes S3 e STS usando as credenciais fornecidas ou as do provedor compartilhado."""
         try:
             if self.credentials:
-                self.s3_client = boto3.client(
-                    's3',
+                session = boto3.Session(
                     aws_access_key_id=self.credentials['aws_access_key_id'],
                     aws_secret_access_key=self.credentials['aws_secret_access_key'],
                     aws_session_token=self.credentials['aws_session_token']
                 )
             else:
-                self.s3_client = boto3.client('s3')  # Usar credenciais padrão se disponíveis
+                session = get_credential_provider().session  # Credenciais padrão, renovadas automaticamente
+            self.s3_client = session.client('s3')
+            self.sts_client = session.client('sts')
         except Exception as e:
             print(f"Erro ao criar cliente S3: {e}")
 
     def check_aws_connection(self) -> bool:
-        """Verifica a conexão com AWS S3."""
-        if not self.s3_client:
-            print("Cliente S3 não está inicializado.")
+        """Verifica a conexão com a AWS."""
+        if not self.sts_client:
+            print("Cliente STS não está inicializado.")
             return False
         
         try:
-            self.s3_client.list_buckets()  # Lista os buckets para verificar a conexão
+            # GetCallerIdentity valida as credenciais sem exigir permissões nem listar recursos
+            self.sts_client.get_caller_identity()
             print("Conexão com AWS bem-sucedida!")
             return True
         except NoCredentialsError:
@@ -0,0 +1,381 @@
+"""
+Servidor HTTP local para testes de carga dos handlers Lambda.
+
+Lê as rotas do serverless.yml, monta eventos no formato do API Gateway e executa os
+handlers em um pool de "containers" simulados, como o Lambda faz:
+
+- cada container atende uma invocação por vez;
+- um container novo paga o cold start (import real dos módulos no modo `processes`
+  e, opcionalmente, um atraso extra com --cold-start-ms);
+- containers ociosos além de --idle-timeout são descartados;
+- sem container livre e com o limite de concorrência atingido, a requisição espera
+  até --queue-timeout e depois recebe 429, como um throttle do Lambda.
+
+Uso:
+    python utils/local_server.py --containers 8 --mode processes --cold-start-ms 800
+
+Para usar serviços AWS locais (moto, LocalStack), passe --endpoint-url; ele é repassado
+aos containers pela variável AWS_ENDPOINT_URL, respeitada pelo boto3.
+
+Métricas do pool ficam em GET /__local/stats.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import Flask, Response, jsonify, request
+
+# Configuração do logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Diretório visao-computacional (onde estão handlers/ e services/)
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(PROJECT_DIR)
+
+DEFAULT_TIMEOUT = 6  # Timeout padrão do Serverless Framework, em segundos
+
+# Handlers do serverless.yml que não existem como módulo com lambda_handler
+LOCAL_HANDLER_OVERRIDES = {
+    "handlers.handler_health": "handlers.handler:lambda_handler",
+    "handlers.handler_v1_description": "services.process_image:v1_description",
+    "handlers.handler_v2_description": "services.process_image:v2_description",
+}
+
+
+def load_routes(serverless_path: str) -> list:
+    """
+    Extrai as rotas httpApi/http do serverless.yml.
+
+    Returns:
+        list: Dicionários com function, handler, method, path e timeout.
+    """
+    routes = []
+    current = None
+    in_functions = False
+
+    with open(serverless_path, encoding="utf-8") as file:
+        for raw_line in file:
+            line = raw_line.split("#", 1)[0].rstrip()
+            if not line.strip():
+                continue
+            indent = len(line) - len(line.lstrip())
+            text = line.strip()
+
+            if indent == 0:
+                in_functions = text == "functions:"
+                continue
+            if not in_functions:
+                continue
+
+            if indent == 2 and text.endswith(":"):
+                current = {"function": text[:-1], "handler": None, "timeout": DEFAULT_TIMEOUT}
+                continue
+            if current is None:
+                continue
+
+            match = re.match(r"(handler|timeout|path|method):\s*['\"]?([^'\"]+)['\"]?$", text.lstrip("- "))
+            if not match:
+                continue
+            key, value = match.groups()
+            if key == "handler":
+                current["handler"] = value
+            elif key == "timeout":
+                current["timeout"] = int(value)
+            elif key == "path":
+                routes.append({**current, "path": value, "method": "ANY"})
+            elif key == "method" and routes and routes[-1]["function"] == current["function"]:
+                routes[-1]["method"] = value.upper()
+
+    return routes
+
+
+def resolve_handler(handler: str):
+    """Converte a string de handler do serverless.yml em uma função Python."""
+    target = LOCAL_HANDLER_OVERRIDES.get(handler, handler)
+    if ":" in target:
+        module_name, function_name = target.split(":", 1)
+        return getattr(importlib.import_module(module_name), function_name)
+
+    try:
+        return importlib.import_module(target).lambda_handler
+    except ModuleNotFoundError:
+        module_name, function_name = target.rsplit(".", 1)
+        return getattr(importlib.import_module(module_name), function_name)
+
+
+# Latências guardadas para os percentis (amostragem de reservatório: memória constante em testes longos)
+LATENCY_RESERVOIR_SIZE = 10000
+
+
+class LocalLambdaContext:
+    """Contexto mínimo compatível com o objeto `context` do Lambda."""
+
+    def __init__(self, function_name: str, timeout: int, request_id: str):
+        self.function_name = function_name
+        self.function_version = "$LATEST"
+        self.invoked_function_arn = f"arn:aws:lambda:local:000000000000:function:{function_name}"
+        self.memory_limit_in_mb = 1024
+        self.aws_request_id = request_id
+        self._deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self) -> int:
+        return max(0, int((self._deadline - time.monotonic()) * 1000))
+
+
+def _invoke(handler: str, function_name: str, timeout: int, event: dict) -> dict:
+    """Executa o handler (no processo do container ou na thread atual)."""
+    context = LocalLambdaContext(function_name, timeout, event["requestContext"]["requestId"])
+    return resolve_handler(handler)(event, context)
+
+
+def _init_container_process(env: dict):
+    """Inicializador dos processos: mesmo ambiente e sys.path do servidor."""
+    os.environ.update(env)
+    if PROJECT_DIR not in sys.path:
+        sys.path.append(PROJECT_DIR)
+
+
+class SimulatedContainer:
+    """Um container Lambda simulado: uma invocação por vez e estado próprio."""
+
+    def __init__(self, container_id: int, mode: str, cold_start_ms: int):
+        self.container_id = container_id
+        self.mode = mode
+        self.cold_start_ms = cold_start_ms
+        self.warm = False
+        self.broken = False  # Estourou o timeout: o worker ainda pode estar executando
+        self.invocations = 0
+        self.last_used = time.monotonic()
+        self._executor = None
+        if mode == "processes":
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, initializer=_init_container_process, initargs=(dict(os.environ),)
+            )
+
+    def invoke(self, route: dict, event: dict) -> tuple:
+        """Executa a invocação e retorna (resposta, houve_cold_start)."""
+        cold = not self.warm
+        if cold and self.cold_start_ms:
+            time.sleep(self.cold_start_ms / 1000)
+
+        args = (route["handler"], route["function"], route["timeout"], event)
+        if self._executor:
+            try:
+                result = self._executor.submit(_invoke, *args).result(timeout=route["timeout"])
+            except FutureTimeoutError:
+                # Como no Lambda, o container que estourou o timeout não é reaproveitado
+                self.broken = True
+                raise
+        else:
+            result = _invoke(*args)
+
+        self.warm = True
+        self.invocations += 1
+        self.last_used = time.monotonic()
+        return result, cold
+
+    def shutdown(self):
+        if self._executor:
+            # O shutdown não interrompe a chamada em andamento: encerra o processo do worker
+            for process in list((getattr(self._executor, "_processes", None) or {}).values()):
+                process.terminate()
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ContainerPool:
+    """Pool de containers por função, com limite de concorrência e métricas."""
+
+    def __init__(self, max_containers: int, mode: str, cold_start_ms: int,
+                 idle_timeout: float, queue_timeout: float):
+        self.max_containers = max_containers
+        self.mode = mode
+        self.cold_start_ms = cold_start_ms
+        self.idle_timeout = idle_timeout
+        self.queue_timeout = queue_timeout
+
+        self._idle = {}  # função -> lista de containers livres
+        self._busy = 0
+        self._next_id = 0
+        self._cond = threading.Condition()
+        self.stats = {"invocations": 0, "cold_starts": 0, "throttles": 0, "errors": 0, "timeouts": 0}
+        self._latencies_ms = []  # Reservatório de até LATENCY_RESERVOIR_SIZE amostras
+
+    def _acquire(self, function_name: str):
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            while True:
+                idle = self._idle.setdefault(function_name, [])
+                self._expire_idle(idle)
+                if idle:
+                    self._busy += 1
+                    return idle.pop()
+                if self._busy + self._idle_count() < self.max_containers:
+                    self._busy += 1
+                    self._next_id += 1
+                    return SimulatedContainer(self._next_id, self.mode, self.cold_start_ms)
+                if not self._evict_other_idle(function_name):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._cond.wait(remaining)
+
+    def _idle_count(self) -> int:
+        return sum(len(containers) for containers in self._idle.values())
+
+    def _expire_idle(self, idle: list):
+        now = time.monotonic()
+        for container in [c for c in idle if now - c.last_used > self.idle_timeout]:
+            idle.remove(container)
+            container.shutdown()
+
+    def _evict_other_idle(self, function_name: str) -> bool:
+        """Libera um container ocioso de outra função para abrir espaço."""
+        for name, containers in self._idle.items():
+            if name != function_name and containers:
+                containers.pop(0).shutdown()
+                return True
+        return False
+
+    def _release(self, function_name: str, container: SimulatedContainer):
+        with self._cond:
+            self._busy -= 1
+            if container.broken:
+                container.shutdown()
+            else:
+                self._idle.setdefault(function_name, []).append(container)
+            self._cond.notify()
+
+    def _record_latency(self, latency_ms: float):
+        """Amostragem de reservatório (algoritmo R); chamada com o lock do pool."""
+        if len(self._latencies_ms) < LATENCY_RESERVOIR_SIZE:
+            self._latencies_ms.append(latency_ms)
+            return
+        index = random.randrange(self.stats["invocations"])
+        if index < LATENCY_RESERVOIR_SIZE:
+            self._latencies_ms[index] = latency_ms
+
+    def invoke(self, route: dict, event: dict) -> tuple:
+        """Executa o evento em um container livre; retorna (resposta, cabeçalhos extras)."""
+        container = self._acquire(route["function"])
+        if container is None:
+            with self._cond:
+                self.stats["throttles"] += 1
+            return {"statusCode": 429, "body": json.dumps({"message": "Too Many Requests"})}, {}
+
+        start = time.monotonic()
+        try:
+            result, cold = container.invoke(route, event)
+        except FutureTimeoutError:
+            logger.error("Container %d: tempo limite de %ss excedido; descartado.", container.container_id, route["timeout"])
+            cold = False
+            result = {"statusCode": 504, "body": json.dumps({"message": "Endpoint request timed out"})}
+            with self._cond:
+                self.stats["timeouts"] += 1
+        except Exception as e:
+            logger.error("Erro no container %d: %s", container.container_id, e)
+            cold = False
+            result = {"statusCode": 502, "body": json.dumps({"message": "Internal server error"})}
+            with self._cond:
+                self.stats["errors"] += 1
+        finally:
+            self._release(route["function"], container)
+
+        with self._cond:
+            self.stats["invocations"] += 1
+            self.stats["cold_starts"] += int(cold)
+            self._record_latency((time.monotonic() - start) * 1000)
+
+        return result, {"X-Local-Container": str(container.container_id), "X-Local-Cold-Start": str(cold).lower()}
+
+    def summary(self) -> dict:
+        """Métricas agregadas do pool."""
+        with self._cond:
+            latencies = sorted(self._latencies_ms)
+            summary = dict(self.stats)
+            summary.update(busy=self._busy, idle=self._idle_count(), max_containers=self.max_containers)
+        if latencies:
+            summary["p50_ms"] = round(latencies[len(latencies) // 2], 2)
+            summary["p95_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 2)
+            summary["max_ms"] = round(latencies[-1], 2)
+        return summary
+
+
+def build_event(route: dict) -> dict:
+    """Monta um evento no formato do API Gateway a partir da requisição Flask atual."""
+    body = request.get_data(as_text=True)
+    now = time.time()
+    return {
+        "resource": route["path"],
+        "path": request.path,
+        "rawPath": request.path,
+        "httpMethod": request.method,
+        "headers": dict(request.headers),
+        "queryStringParameters": dict(request.args) or None,
+        "body": body or None,
+        "isBase64Encoded": False,
+        "requestContext": {
+            "requestId": str(uuid.uuid4()),
+            "stage": "local",
+            "requestTimeEpoch": int(now * 1000),
+            "http": {"method": request.method, "path": request.path, "sourceIp": request.remote_addr},
+        },
+    }
+
+
+def create_app(pool: ContainerPool, routes: list) -> Flask:
+    """Cria o app Flask que encaminha cada rota do serverless.yml para o pool."""
+    app = Flask(__name__)
+
+    @app.route("/__local/stats", methods=["GET"])
+    def local_stats():
+        return jsonify(pool.summary())
+
+    def make_view(route):
+        def view():
+            result, extra_headers = pool.invoke(route, build_event(route))
+            headers = {**(result.get("headers") or {}), **extra_headers}
+            return Response(result.get("body") or "", status=result.get("statusCode", 200),
+                            headers=headers, content_type=headers.get("Content-Type", "application/json"))
+        return view
+
+    for route in routes:
+        methods = None if route["method"] in ("ANY", "*") else [route["method"]]
+        app.add_url_rule(route["path"], endpoint=route["function"], view_func=make_view(route), methods=methods)
+        logger.info("Rota %s %s -> %s", route["method"], route["path"], route["handler"])
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local multi-container para os handlers Lambda.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--serverless", default=os.path.join(PROJECT_DIR, "serverless.yml"))
+    parser.add_argument("--containers", type=int, default=10, help="Concorrência máxima (containers).")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads")
+    parser.add_argument("--cold-start-ms", type=int, default=0, help="Atraso extra no cold start.")
+    parser.add_argument("--idle-timeout", type=float, default=300, help="Segundos até descartar um container ocioso.")
+    parser.add_argument("--queue-timeout", type=float, default=1.0, help="Espera por container antes do 429.")
+    parser.add_argument("--endpoint-url", help="Endpoint AWS local (moto, LocalStack).")
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        os.environ["AWS_ENDPOINT_URL"] = args.endpoint_url
+
+    pool = ContainerPool(args.containers, args.mode, args.cold_start_ms, args.idle_timeout, args.queue_timeout)
+    app = create_app(pool, load_routes(args.serverless))
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()